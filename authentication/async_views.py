@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .tokens import create_jwt_pair_for_user
+
+User = get_user_model()
+
+DEFAULT_PASSWORD_HASH_WORKERS = 4
+
+# Password hashing is CPU bound and takes tens of milliseconds: it runs on a
+# few dedicated threads so that the event loop keeps serving other requests,
+# and so that a burst of logins queues up instead of spawning threads.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=getattr(
+        settings, "SOFTDESK_PASSWORD_HASH_WORKERS", DEFAULT_PASSWORD_HASH_WORKERS
+    ),
+    thread_name_prefix="password-hash",
+)
+
+
+def check_password(user, password):
+    """Same timing whether the user exists or not, as ModelBackend does"""
+    if user is None:
+        User().set_password(password)
+        return False
+    return user.check_password(password) and user.is_active
+
+
+class AsyncLoginView(View):
+    """Async LoginView for ASGI deployments"""
+
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request):
+        try:
+            parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+            data = Request(request, parsers=parsers).data
+            email = data.get("email")
+            password = data.get("password")
+        except (ParseError, AttributeError):
+            email = password = None
+
+        user = None
+        if email is not None and password is not None:
+            user = await User.objects.filter(**{User.USERNAME_FIELD: email}).afirst()
+
+        loop = asyncio.get_running_loop()
+        authenticated = await loop.run_in_executor(
+            password_hash_executor, check_password, user, password
+        )
+
+        if authenticated:
+            tokens = create_jwt_pair_for_user(user)
+
+            response = {"message": "Login Successfull", "tokens": tokens}
+            return self.render(response, status.HTTP_200_OK)
+
+        else:
+            return self.render({"message": "Invalid email or password"})
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type=self.renderer.media_type,
+        )
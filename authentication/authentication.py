@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TIMEOUT = 60
+
+
+class UserCache:
+    """Thread-safe LRU of users keyed by their token id, with a TTL"""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, user_id, user):
+        key = str(user_id)
+        with self._lock:
+            self._entries[key] = (monotonic() + self.timeout, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    getattr(settings, "SOFTDESK_USER_CACHE_SIZE", DEFAULT_CACHE_SIZE),
+    getattr(settings, "SOFTDESK_USER_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the token's user from user_cache, so that a
+    user is read from the database once per timeout instead of once per
+    request. Entries are dropped when the user is saved or deleted in this
+    process; the timeout bounds how long other processes may lag behind.
+    Users are read from the primary so that a read replica cannot put a
+    stale user back in the cache.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.using(DEFAULT_DB_ALIAS).get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+
+        return self.check_user(validated_token, user)
+
+    async def aauthenticate(self, request):
+        """Async authenticate, for the views of the async stack"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.using(DEFAULT_DB_ALIAS).aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+
+        return self.check_user(validated_token, user)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, validated_token, user):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # Setting and helper only exist in recent djangorestframework-simplejwt
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        # Each request gets its own instance, the cached one is never mutated
+        return copy(user)
@@ -0,0 +1,7 @@
+"""
+HTTP load benchmarks for the softdesk API.
+
+    python -m benchmarks run --users 50 --issues-per-project 200 -o bench.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks concurrency --readers 8 --writers 2 --duration 10
+"""
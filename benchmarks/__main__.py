@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+
+def git_revision():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_django(db_file):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "softdesk.settings")
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.ALLOWED_HOSTS = ["testserver"]
+    if db_file:
+        settings.DATABASES["default"].setdefault("TEST", {})["NAME"] = db_file
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return connection
+
+
+def run(args):
+    connection = setup_django(args.db_file)
+
+    from .dataset import DatasetConfig, seed_dataset
+    from .http import build_scenarios, run_benchmarks, uncovered_url_names
+
+    import django
+
+    config = DatasetConfig(
+        users=args.users,
+        projects_per_user=args.projects_per_user,
+        contributors_per_project=args.contributors_per_project,
+        issues_per_project=args.issues_per_project,
+        comments_per_issue=args.comments_per_issue,
+        seed=args.seed,
+    )
+
+    try:
+        missing = uncovered_url_names(build_scenarios())
+        if missing:
+            print("Routes sans scénario : " + ", ".join(missing), file=sys.stderr)
+
+        user = seed_dataset(config)
+        results = run_benchmarks(user, args.iterations, args.warmup, args.only)
+    finally:
+        connection.creation.destroy_test_db(
+            connection.settings_dict["NAME"], verbosity=0
+        )
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "dataset": config.as_dict(),
+        },
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+
+    print_results(results)
+    print("\nRésultats écrits dans " + args.output)
+
+
+def concurrency(args):
+    # Threads only share an on-disk database, never an in-memory one
+    temp_dir = None if args.db_file else tempfile.mkdtemp(prefix="softdesk-bench-")
+    db_file = args.db_file or os.path.join(temp_dir, "db.sqlite3")
+    connection = setup_django(db_file)
+
+    from .concurrency import run_concurrency
+    from .dataset import DatasetConfig, seed_dataset
+
+    config = DatasetConfig(
+        users=args.users,
+        projects_per_user=args.projects_per_user,
+        contributors_per_project=args.contributors_per_project,
+        issues_per_project=args.issues_per_project,
+        comments_per_issue=args.comments_per_issue,
+        seed=args.seed,
+    )
+
+    try:
+        user = seed_dataset(config)
+        results = run_concurrency(
+            user,
+            db_file,
+            args.readers,
+            args.writers,
+            args.duration,
+            args.profiles,
+        )
+    finally:
+        connection.creation.destroy_test_db(
+            connection.settings_dict["NAME"], verbosity=0
+        )
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "readers": args.readers,
+            "writers": args.writers,
+            "duration": args.duration,
+            "dataset": config.as_dict(),
+        },
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+
+    print(
+        "%-12s %-7s %10s %10s %10s %8s"
+        % ("profil", "", "req/s", "p50 ms", "p95 ms", "erreurs")
+    )
+    for profile, result in results.items():
+        for kind in ("reads", "writes"):
+            print(
+                "%-12s %-7s %10.1f %10.2f %10.2f %8d"
+                % (
+                    profile,
+                    kind,
+                    result[kind]["throughput_rps"],
+                    result[kind]["p50_ms"],
+                    result[kind]["p95_ms"],
+                    result[kind]["errors"],
+                )
+            )
+    print("\nRésultats écrits dans " + args.output)
+
+
+def print_results(results):
+    print(
+        "%-22s %10s %10s %10s %10s %8s"
+        % ("scénario", "p50 ms", "p95 ms", "p99 ms", "req/s", "queries")
+    )
+    for name, result in results.items():
+        print(
+            "%-22s %10.2f %10.2f %10.2f %10.1f %8.1f"
+            % (
+                name,
+                result["p50_ms"],
+                result["p95_ms"],
+                result["p99_ms"],
+                result["throughput_rps"] or 0,
+                result["queries_per_request"],
+            )
+        )
+
+
+def compare(args):
+    with open(args.before, encoding="utf-8") as before_file:
+        before = json.load(before_file)
+    with open(args.after, encoding="utf-8") as after_file:
+        after = json.load(after_file)
+
+    print(
+        "%s (%s) -> %s (%s)"
+        % (
+            args.before,
+            before["meta"].get("revision"),
+            args.after,
+            after["meta"].get("revision"),
+        )
+    )
+    print(
+        "%-22s %12s %12s %10s %14s"
+        % ("scénario", "p50 ms", "p95 ms", "Δ p95", "queries")
+    )
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print("%-22s (nouveau)" % name)
+            continue
+        change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        print(
+            "%-22s %5.1f→%-6.1f %5.1f→%-6.1f %+9.1f%% %6.1f→%-6.1f"
+            % (
+                name,
+                old["p50_ms"],
+                new["p50_ms"],
+                old["p95_ms"],
+                new["p95_ms"],
+                change,
+                old["queries_per_request"],
+                new["queries_per_request"],
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed a dataset and time every route")
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--projects-per-user", type=int, default=2)
+    run_parser.add_argument("--contributors-per-project", type=int, default=5)
+    run_parser.add_argument("--issues-per-project", type=int, default=50)
+    run_parser.add_argument("--comments-per-issue", type=int, default=5)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--iterations", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument(
+        "--only", nargs="*", help="Only run the scenarios with these names"
+    )
+    run_parser.add_argument(
+        "--db-file", help="SQLite file for the benchmark database (default: memory)"
+    )
+    run_parser.add_argument("-o", "--output", default="bench_output.json")
+    run_parser.set_defaults(func=run)
+
+    concurrency_parser = commands.add_parser(
+        "concurrency",
+        help="Concurrent readers and writers under each SQLite database profile",
+    )
+    concurrency_parser.add_argument("--users", type=int, default=20)
+    concurrency_parser.add_argument("--projects-per-user", type=int, default=2)
+    concurrency_parser.add_argument("--contributors-per-project", type=int, default=5)
+    concurrency_parser.add_argument("--issues-per-project", type=int, default=50)
+    concurrency_parser.add_argument("--comments-per-issue", type=int, default=5)
+    concurrency_parser.add_argument("--seed", type=int, default=42)
+    concurrency_parser.add_argument("--readers", type=int, default=8)
+    concurrency_parser.add_argument("--writers", type=int, default=2)
+    concurrency_parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds per profile"
+    )
+    concurrency_parser.add_argument(
+        "--profiles",
+        nargs="*",
+        default=["development", "production"],
+        help="Entries of SOFTDESK_DATABASE_PROFILES to compare",
+    )
+    concurrency_parser.add_argument(
+        "--db-file", help="SQLite file for the benchmark database (default: temp)"
+    )
+    concurrency_parser.add_argument("-o", "--output", default="bench_concurrency.json")
+    concurrency_parser.set_defaults(func=concurrency)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
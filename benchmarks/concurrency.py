@@ -0,0 +1,125 @@
+import os
+import shutil
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+from authentication.tokens import create_jwt_pair_for_user
+from myapp.database import get_profile
+
+from .http import BenchmarkContext, percentile
+
+
+class Worker(threading.Thread):
+    """
+    Sends the same request in a loop until stop is set, on its own thread
+    and so on its own database connection, as a server worker would.
+    """
+
+    def __init__(self, request, token, stop):
+        super().__init__(daemon=True)
+        self.request = request
+        self.token = token
+        self.stop = stop
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        try:
+            while not self.stop.is_set():
+                start = perf_counter()
+                try:
+                    response = self.request(client)
+                    failed = response.status_code >= 400
+                except Exception:
+                    # "database is locked" surfaces as an OperationalError
+                    failed = True
+                if failed:
+                    self.errors += 1
+                else:
+                    self.latencies.append(perf_counter() - start)
+        finally:
+            connection.close()
+
+
+def summarize(workers, duration):
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    return {
+        "requests": len(latencies),
+        "errors": sum(worker.errors for worker in workers),
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round((percentile(latencies, 50) or 0) * 1000, 3),
+        "p95_ms": round((percentile(latencies, 95) or 0) * 1000, 3),
+    }
+
+
+def run_profile(profile, db_file, ctx, readers, writers, duration):
+    """Run readers and writers against a copy of db_file using profile"""
+    source = connection.settings_dict["NAME"]
+    connections.close_all()
+    shutil.copyfile(source, db_file)
+
+    settings_dict = connection.settings_dict
+    active_profile = settings.SOFTDESK_DATABASE_PROFILE
+    settings.SOFTDESK_DATABASE_PROFILE = profile
+    settings_dict["NAME"] = db_file
+    settings_dict["CONN_MAX_AGE"] = get_profile(profile)["CONN_MAX_AGE"]
+
+    token = create_jwt_pair_for_user(ctx.user)["access"]
+    issues_url = "/api/projects/%d/issues/" % ctx.project.id
+    project_url = "/api/projects/%d" % ctx.project.id
+
+    def read(client):
+        client.get(project_url)
+        return client.get(issues_url)
+
+    def write(client):
+        return client.post(issues_url, ctx.issue_body(), format="json")
+
+    stop = threading.Event()
+    read_workers = [Worker(read, token, stop) for _ in range(readers)]
+    write_workers = [Worker(write, token, stop) for _ in range(writers)]
+    try:
+        for worker in read_workers + write_workers:
+            worker.start()
+        stop.wait(duration)
+    finally:
+        stop.set()
+        for worker in read_workers + write_workers:
+            worker.join()
+        connections.close_all()
+        settings.SOFTDESK_DATABASE_PROFILE = active_profile
+        settings_dict["NAME"] = source
+        settings_dict["CONN_MAX_AGE"] = get_profile()["CONN_MAX_AGE"]
+
+    return {
+        "reads": summarize(read_workers, duration),
+        "writes": summarize(write_workers, duration),
+    }
+
+
+def run_concurrency(user, db_file, readers, writers, duration, profiles):
+    """
+    Same read/write mix for each database profile, each one on a fresh copy
+    of the seeded database so that they start from identical data.
+    """
+    ctx = BenchmarkContext(user)
+    results = {}
+    for profile in profiles:
+        profile_file = "%s.%s" % (db_file, profile)
+        try:
+            results[profile] = run_profile(
+                profile, profile_file, ctx, readers, writers, duration
+            )
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(profile_file + suffix)
+                except FileNotFoundError:
+                    pass
+    return results
@@ -0,0 +1,132 @@
+import random
+from dataclasses import dataclass, asdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from myapp.counters import reconcile_counters
+from myapp.models import Projects, Contributors, Issues, Comments
+
+User = get_user_model()
+
+PASSWORD = "benchmark"
+STATUSES = ["À faire", "En cours", "Terminé"]
+PRIORITIES = ["Faible", "Moyenne", "Élevée"]
+TAGS = ["Bug", "Amélioration", "Tâche"]
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 20
+    projects_per_user: int = 2
+    contributors_per_project: int = 5
+    issues_per_project: int = 50
+    comments_per_issue: int = 5
+    seed: int = 42
+    batch_size: int = 1000
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def seed_dataset(config):
+    """
+    Fill the current database with a deterministic dataset and return the
+    user that owns the first project, used as the benchmark client.
+    """
+    rng = random.Random(config.seed)
+    password = make_password(PASSWORD)
+
+    User.objects.bulk_create(
+        [
+            User(
+                email="bench%d@softdesk.local" % index,
+                first_name="Bench",
+                last_name=str(index),
+                password=password,
+            )
+            for index in range(config.users)
+        ],
+        batch_size=config.batch_size,
+    )
+    user_ids = list(
+        User.objects.filter(email__endswith="@softdesk.local")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    Projects.objects.bulk_create(
+        [
+            Projects(
+                title="Projet %d-%d" % (user_id, index),
+                description="Projet de benchmark",
+                type="back-end",
+                author_user_id_id=user_id,
+            )
+            for user_id in user_ids
+            for index in range(config.projects_per_user)
+        ],
+        batch_size=config.batch_size,
+    )
+    projects = list(
+        Projects.objects.filter(author_user_id__in=user_ids)
+        .order_by("id")
+        .values_list("id", "author_user_id")
+    )
+
+    contributors = []
+    for project_id, author_id in projects:
+        members = rng.sample(
+            user_ids, min(config.contributors_per_project, len(user_ids))
+        )
+        for user_id in members:
+            if user_id != author_id:
+                contributors.append(
+                    Contributors(
+                        project_id_id=project_id,
+                        user_id_id=user_id,
+                        permission="contributeur",
+                        role="développeur",
+                    )
+                )
+    Contributors.objects.bulk_create(contributors, batch_size=config.batch_size)
+
+    issues = []
+    for project_id, author_id in projects:
+        for index in range(config.issues_per_project):
+            issues.append(
+                Issues(
+                    title="Problème %d" % index,
+                    description="x" * rng.randint(50, 1000),
+                    tag=rng.choice(TAGS),
+                    priority=rng.choice(PRIORITIES),
+                    status=rng.choice(STATUSES),
+                    project_id_id=project_id,
+                    author_user_id_id=author_id,
+                    assignee_user_id_id=rng.choice(user_ids),
+                )
+            )
+    Issues.objects.bulk_create(issues, batch_size=config.batch_size)
+
+    issue_ids = Issues.objects.filter(
+        project_id__in=[project_id for project_id, _ in projects]
+    ).values_list("id", "author_user_id")
+    comments = []
+    for issue_id, author_id in issue_ids.iterator():
+        for index in range(config.comments_per_issue):
+            comments.append(
+                Comments(
+                    description="y" * rng.randint(20, 1000),
+                    author_user_id_id=author_id,
+                    issue_id_id=issue_id,
+                )
+            )
+            if len(comments) >= config.batch_size:
+                Comments.objects.bulk_create(comments)
+                comments = []
+    Comments.objects.bulk_create(comments)
+
+    # bulk_create sends no signals: compute the counters in one pass
+    reconcile_counters([project_id for project_id, _ in projects])
+
+    return User.objects.get(id=projects[0][1])
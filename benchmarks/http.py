@@ -0,0 +1,482 @@
+import statistics
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Optional
+
+from django.db import connection
+from django.urls import get_resolver
+from rest_framework.test import APIClient
+
+from authentication.tokens import create_jwt_pair_for_user
+from myapp.jobs import claim, enqueue, run
+from myapp.models import Projects, Contributors, Issues, Comments
+
+from .dataset import PASSWORD
+
+# Routes that are not part of the JSON API
+SKIPPED_URL_NAMES = {"admin", "login", "logout"}
+
+
+@dataclass
+class Scenario:
+    """
+    One timed request. ``setup`` runs untimed before each iteration and
+    returns the keyword arguments used to build the url and the body, so that
+    destructive endpoints always hit a fresh row.
+    """
+
+    name: str
+    url_name: str
+    method: str
+    url: Callable
+    body: Optional[Callable] = None
+    setup: Optional[Callable] = None
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkContext:
+    """Objects of the seeded dataset the scenarios point at"""
+
+    def __init__(self, user):
+        self.user = user
+        self.project = Projects.objects.filter(author_user_id=user).order_by("id")[0]
+        self.issue = Issues.objects.filter(project_id=self.project).order_by("id")[0]
+        self.comment = Comments.objects.filter(issue_id=self.issue).order_by("id")[0]
+        self.member = (
+            Contributors.objects.filter(project_id=self.project)
+            .exclude(user_id=user)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        self.counter = 0
+
+    def unique(self):
+        self.counter += 1
+        return self.counter
+
+    def new_project(self):
+        return Projects.objects.create(
+            title="Jetable",
+            description="Projet supprimé par le benchmark",
+            type="back-end",
+            author_user_id=self.user,
+        )
+
+    def new_issue(self):
+        return Issues.objects.create(
+            title="Jetable",
+            description="Problème supprimé par le benchmark",
+            tag="Bug",
+            priority="Faible",
+            status="À faire",
+            project_id=self.project,
+            author_user_id=self.user,
+            assignee_user_id=self.user,
+        )
+
+    def new_comment(self):
+        return Comments.objects.create(
+            description="Commentaire supprimé par le benchmark",
+            author_user_id=self.user,
+            issue_id=self.issue,
+        )
+
+    def export_job(self):
+        """A finished export of the project, made once"""
+        if not hasattr(self, "_export_job"):
+            job = enqueue("export_project", self.project.id, self.user, output="ndjson")
+            # Older jobs (project delete...) are claimed first
+            while True:
+                claimed = claim()
+                if claimed is None:
+                    break
+                run(claimed.id)
+            job.refresh_from_db()
+            self._export_job = job
+        return self._export_job
+
+    def open_project_requests(self):
+        """The calls of a client opening the project, as one batch"""
+        project_url = "/api/projects/%d" % self.project.id
+        return [
+            {"method": "GET", "path": project_url},
+            {"method": "GET", "path": project_url + "/users/"},
+            {"method": "GET", "path": project_url + "/issues/"},
+            {
+                "method": "GET",
+                "path": "%s/issues/%d/comments/" % (project_url, self.issue.id),
+            },
+        ]
+
+    def issue_body(self):
+        return {
+            "title": "Problème benchmark",
+            "description": "Créé par le benchmark",
+            "tag": "Bug",
+            "priority": "Faible",
+            "status": "À faire",
+            "assignee_user_id": self.user.id,
+        }
+
+
+def build_scenarios():
+    def added_contributor(ctx):
+        Contributors.objects.filter(project_id=ctx.project, user_id=ctx.user).delete()
+        return {}
+
+    def removable_contributor(ctx):
+        Contributors.objects.get_or_create(
+            project_id=ctx.project,
+            user_id_id=ctx.member,
+            defaults={"permission": "contributeur", "role": "développeur"},
+        )
+        return {}
+
+    return [
+        Scenario(
+            "signup",
+            "signup",
+            "post",
+            lambda ctx: "/api/signup/",
+            lambda ctx: {
+                "email": "signup%d@softdesk.local" % ctx.unique(),
+                "first_name": "Bench",
+                "last_name": "Signup",
+                "password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "login",
+            "login",
+            "post",
+            lambda ctx: "/api/login/",
+            lambda ctx: {"email": ctx.user.email, "password": PASSWORD},
+        ),
+        Scenario("login (get)", "login", "get", lambda ctx: "/api/login/"),
+        Scenario("projects list", "projects", "get", lambda ctx: "/api/projects/"),
+        Scenario(
+            "projects create",
+            "projects",
+            "post",
+            lambda ctx: "/api/projects/",
+            lambda ctx: {"title": "Benchmark", "description": "b", "type": "back-end"},
+        ),
+        Scenario(
+            "project detail",
+            "project-detail",
+            "get",
+            lambda ctx: "/api/projects/%d" % ctx.project.id,
+        ),
+        Scenario(
+            "project update",
+            "project-detail",
+            "put",
+            lambda ctx: "/api/projects/%d" % ctx.project.id,
+            lambda ctx: {
+                "title": ctx.project.title,
+                "description": ctx.project.description,
+                "type": ctx.project.type,
+            },
+        ),
+        Scenario(
+            "project delete",
+            "project-detail",
+            "delete",
+            lambda ctx, project: "/api/projects/%d" % project.id,
+            setup=lambda ctx: {"project": ctx.new_project()},
+        ),
+        Scenario(
+            "project export",
+            "project-export",
+            "get",
+            lambda ctx: "/api/projects/%d/export/?output=ndjson" % ctx.project.id,
+        ),
+        Scenario(
+            "project search",
+            "project-search",
+            "get",
+            lambda ctx: "/api/projects/%d/search/?q=probleme" % ctx.project.id,
+        ),
+        Scenario(
+            "project changes",
+            "project-changes",
+            "get",
+            lambda ctx: "/api/projects/%d/changes/?since=%d"
+            % (ctx.project.id, max(ctx.project.change_seq - 50, 0)),
+        ),
+        Scenario(
+            "project jobs list",
+            "project-jobs",
+            "get",
+            lambda ctx: "/api/projects/%d/jobs/" % ctx.project.id,
+        ),
+        Scenario(
+            "project jobs create",
+            "project-jobs",
+            "post",
+            lambda ctx: "/api/projects/%d/jobs/" % ctx.project.id,
+            lambda ctx: {"kind": "export_project", "output": "ndjson"},
+        ),
+        Scenario(
+            "project job",
+            "project-job",
+            "get",
+            lambda ctx, job: "/api/projects/%d/jobs/%d" % (ctx.project.id, job.id),
+            setup=lambda ctx: {"job": ctx.export_job()},
+        ),
+        Scenario(
+            "project job file",
+            "project-job-file",
+            "get",
+            lambda ctx, job: "/api/projects/%d/jobs/%d/file" % (ctx.project.id, job.id),
+            setup=lambda ctx: {"job": ctx.export_job()},
+        ),
+        Scenario(
+            "contributors list",
+            "project-users",
+            "get",
+            lambda ctx: "/api/projects/%d/users/" % ctx.project.id,
+        ),
+        Scenario(
+            "contributors add",
+            "project-users",
+            "post",
+            lambda ctx: "/api/projects/%d/users/" % ctx.project.id,
+            lambda ctx: {
+                "user_id": ctx.user.id,
+                "permission": "contributeur",
+                "role": "développeur",
+            },
+            setup=added_contributor,
+        ),
+        Scenario(
+            "contributors batch",
+            "project-users-batch",
+            "post",
+            lambda ctx: "/api/projects/%d/users/batch/" % ctx.project.id,
+            lambda ctx: {
+                "add": [
+                    {
+                        "user_id": ctx.member,
+                        "permission": "contributeur",
+                        "role": "développeur",
+                    }
+                ],
+                "remove": [ctx.user.id],
+            },
+        ),
+        Scenario(
+            "contributor remove",
+            "project-user",
+            "delete",
+            lambda ctx: "/api/projects/%d/users/%d" % (ctx.project.id, ctx.member),
+            setup=removable_contributor,
+        ),
+        Scenario(
+            "issues list",
+            "project-issues",
+            "get",
+            lambda ctx: "/api/projects/%d/issues/" % ctx.project.id,
+        ),
+        Scenario(
+            "issues create",
+            "project-issues",
+            "post",
+            lambda ctx: "/api/projects/%d/issues/" % ctx.project.id,
+            lambda ctx: ctx.issue_body(),
+        ),
+        Scenario(
+            "issue update",
+            "project-issue",
+            "put",
+            lambda ctx: "/api/projects/%d/issues/%d" % (ctx.project.id, ctx.issue.id),
+            lambda ctx: ctx.issue_body(),
+        ),
+        Scenario(
+            "issue delete",
+            "project-issue",
+            "delete",
+            lambda ctx, issue: "/api/projects/%d/issues/%d"
+            % (ctx.project.id, issue.id),
+            setup=lambda ctx: {"issue": ctx.new_issue()},
+        ),
+        Scenario(
+            "comments list",
+            "issue-comments",
+            "get",
+            lambda ctx: "/api/projects/%d/issues/%d/comments/"
+            % (ctx.project.id, ctx.issue.id),
+        ),
+        Scenario(
+            "comments create",
+            "issue-comments",
+            "post",
+            lambda ctx: "/api/projects/%d/issues/%d/comments/"
+            % (ctx.project.id, ctx.issue.id),
+            lambda ctx: {"description": "Commentaire benchmark"},
+        ),
+        Scenario(
+            "comment detail",
+            "issue-comment",
+            "get",
+            lambda ctx: "/api/projects/%d/issues/%d/comments/%d"
+            % (ctx.project.id, ctx.issue.id, ctx.comment.id),
+        ),
+        Scenario(
+            "comment update",
+            "issue-comment",
+            "put",
+            lambda ctx: "/api/projects/%d/issues/%d/comments/%d"
+            % (ctx.project.id, ctx.issue.id, ctx.comment.id),
+            lambda ctx: {"description": "Commentaire modifié"},
+        ),
+        Scenario(
+            "comment delete",
+            "issue-comment",
+            "delete",
+            lambda ctx, comment: "/api/projects/%d/issues/%d/comments/%d"
+            % (ctx.project.id, ctx.issue.id, comment.id),
+            setup=lambda ctx: {"comment": ctx.new_comment()},
+        ),
+        Scenario(
+            "batch",
+            "batch",
+            "post",
+            lambda ctx: "/api/batch/",
+            lambda ctx: {"requests": ctx.open_project_requests()},
+        ),
+        Scenario(
+            "async login",
+            "async-login",
+            "post",
+            lambda ctx: "/api/async/login/",
+            lambda ctx: {"email": ctx.user.email, "password": PASSWORD},
+        ),
+        Scenario(
+            "async projects list",
+            "async-projects",
+            "get",
+            lambda ctx: "/api/async/projects/",
+        ),
+        Scenario(
+            "async project detail",
+            "async-project-detail",
+            "get",
+            lambda ctx: "/api/async/projects/%d" % ctx.project.id,
+        ),
+        Scenario(
+            "async contributors list",
+            "async-project-users",
+            "get",
+            lambda ctx: "/api/async/projects/%d/users/" % ctx.project.id,
+        ),
+        Scenario(
+            "async issues list",
+            "async-project-issues",
+            "get",
+            lambda ctx: "/api/async/projects/%d/issues/" % ctx.project.id,
+        ),
+        Scenario(
+            "async issues create",
+            "async-project-issues",
+            "post",
+            lambda ctx: "/api/async/projects/%d/issues/" % ctx.project.id,
+            lambda ctx: ctx.issue_body(),
+        ),
+        Scenario(
+            "async comments list",
+            "async-issue-comments",
+            "get",
+            lambda ctx: "/api/async/projects/%d/issues/%d/comments/"
+            % (ctx.project.id, ctx.issue.id),
+        ),
+        Scenario(
+            "async comment detail",
+            "async-issue-comment",
+            "get",
+            lambda ctx: "/api/async/projects/%d/issues/%d/comments/%d"
+            % (ctx.project.id, ctx.issue.id, ctx.comment.id),
+        ),
+    ]
+
+
+def uncovered_url_names(scenarios):
+    covered = {scenario.url_name for scenario in scenarios}
+    names = {
+        pattern.name
+        for pattern in get_resolver().url_patterns
+        if getattr(pattern, "name", None)
+    }
+    return sorted(names - covered - SKIPPED_URL_NAMES)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_scenario(client, ctx, scenario, iterations, warmup):
+    latencies = []
+    queries = []
+    statuses = {}
+
+    for index in range(warmup + iterations):
+        kwargs = scenario.setup(ctx) if scenario.setup else {}
+        url = scenario.url(ctx, **kwargs)
+        body = scenario.body(ctx) if scenario.body else None
+        counter = QueryCounter()
+
+        with connection.execute_wrapper(counter):
+            start = perf_counter()
+            response = getattr(client, scenario.method)(url, body, format="json")
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = perf_counter() - start
+
+        if index < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(counter.count)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "url_name": scenario.url_name,
+        "method": scenario.method.upper(),
+        "iterations": iterations,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "throughput_rps": round(iterations / total, 1) if total else None,
+        "queries_per_request": round(statistics.mean(queries), 2),
+    }
+
+
+def run_benchmarks(user, iterations, warmup, only=None):
+    ctx = BenchmarkContext(user)
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION="Bearer " + create_jwt_pair_for_user(user)["access"]
+    )
+
+    results = {}
+    for scenario in build_scenarios():
+        if only and scenario.name not in only:
+            continue
+        results[scenario.name] = run_scenario(client, ctx, scenario, iterations, warmup)
+    return results
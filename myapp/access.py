@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import NamedTuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
+
+from .models import Projects, Contributors
+
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_CACHE_TIMEOUT = 10
+
+# Token of the project's memberships in the shared cache, replaced by every
+# invalidation so that the other processes drop their cached entries
+GENERATION_KEY = "softdesk:project:%s:access"
+
+
+class ProjectAccess(NamedTuple):
+    """Result of a membership lookup for one (project, user) pair"""
+
+    author_user_id: int
+    is_member: bool
+
+    def is_author(self, user_id):
+        return self.author_user_id == user_id
+
+
+class AccessCache:
+    """
+    Thread-safe LRU of ProjectAccess keyed by (project_id, user_id), with a
+    TTL. An entry is only returned for the project generation it was read
+    under.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._by_project = {}
+        self._lock = Lock()
+
+    def get(self, project_id, user_id, generation=None):
+        key = (project_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_generation, access = entry
+            if expires <= monotonic() or entry_generation != generation:
+                # Replaced by the caller's set()
+                return None
+            self._entries.move_to_end(key)
+            return access
+
+    def set(self, project_id, user_id, access, generation=None):
+        key = (project_id, user_id)
+        with self._lock:
+            self._entries[key] = (monotonic() + self.timeout, generation, access)
+            self._entries.move_to_end(key)
+            self._by_project.setdefault(project_id, set()).add(user_id)
+
+            while len(self._entries) > self.maxsize:
+                (old_project_id, old_user_id), _ = self._entries.popitem(last=False)
+                users = self._by_project.get(old_project_id)
+                if users is not None:
+                    users.discard(old_user_id)
+                    if not users:
+                        del self._by_project[old_project_id]
+
+    def invalidate_project(self, project_id):
+        with self._lock:
+            for user_id in self._by_project.pop(project_id, ()):
+                self._entries.pop((project_id, user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_project.clear()
+
+
+access_cache = AccessCache(
+    getattr(settings, "SOFTDESK_ACCESS_CACHE_SIZE", DEFAULT_CACHE_SIZE),
+    getattr(settings, "SOFTDESK_ACCESS_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT),
+)
+
+
+def project_access_queryset(project_id, user_id):
+    # Read from the primary: the cached access lives until the next
+    # invalidation, a lagging replica would bring back the old membership
+    return (
+        Projects.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id=project_id)
+        .annotate(
+            is_contributor=Exists(
+                Contributors.objects.filter(project_id=OuterRef("pk"), user_id=user_id)
+            )
+        )
+        .values_list("author_user_id", "is_contributor")
+    )
+
+
+def get_project_access(project_id, user_id):
+    """
+    Return the ProjectAccess of user_id on project_id.
+
+    Answered from memory when possible, otherwise with a single query on the
+    project primary key and the Contributors (project_id, user_id) index.
+    Raises Projects.DoesNotExist when the project does not exist.
+    """
+    project_id = int(project_id)
+    # Read before the row, so that an invalidation in between is not missed
+    generation = cache.get(GENERATION_KEY % project_id)
+    access = access_cache.get(project_id, user_id, generation)
+    if access is not None:
+        return access
+
+    row = project_access_queryset(project_id, user_id).first()
+    return cache_access(project_id, user_id, row, generation)
+
+
+async def aget_project_access(project_id, user_id):
+    """Async get_project_access"""
+    project_id = int(project_id)
+    generation = await cache.aget(GENERATION_KEY % project_id)
+    access = access_cache.get(project_id, user_id, generation)
+    if access is not None:
+        return access
+
+    row = await project_access_queryset(project_id, user_id).afirst()
+    return cache_access(project_id, user_id, row, generation)
+
+
+def cache_access(project_id, user_id, row, generation):
+    if row is None:
+        raise Projects.DoesNotExist("Projects matching query does not exist.")
+
+    author_user_id, is_contributor = row
+    access = ProjectAccess(author_user_id, is_contributor or author_user_id == user_id)
+    access_cache.set(project_id, user_id, access, generation)
+    return access
+
+
+def invalidate_project_access(project_id):
+    """
+    Drop the cached memberships of the project, in this process right away
+    and in the others through the shared cache backend (or after the TTL
+    with a per-process backend)
+    """
+    project_id = int(project_id)
+    access_cache.invalidate_project(project_id)
+    cache.set(GENERATION_KEY % project_id, uuid4().hex, None)
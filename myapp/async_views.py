@@ -0,0 +1,486 @@
+"""
+Async versions of the project, contributor, issue and comment views, served
+under api/async/ for ASGI deployments.
+
+Reads use the async ORM interface, so a worker waiting on slow clients does
+not hold a thread. Writes validate and save in a single sync_to_async hop
+so that the model signals (versions, counters, cache invalidation) still
+run exactly as in myapp.views.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from authentication.authentication import CachedJWTAuthentication
+from .access import aget_project_access, invalidate_project_access
+from .models import Projects
+from .pagination import IdKeysetPagination, CreatedTimeKeysetPagination
+from .queries import (
+    project_queryset,
+    contributors_queryset,
+    contributor_queryset,
+    issues_queryset,
+    issue_queryset,
+    issue_version_queryset,
+    comments_queryset,
+    comment_queryset,
+    comment_version_queryset,
+)
+from .project_cache import aadd_counters, aserialized_projects
+from .serializers import (
+    values_reader,
+    ProjectsSerializer,
+    ContributorsSerializer,
+    IssuesSerializer,
+    CommentsSerializer,
+)
+from .versioning import aget_project_version, project_etag, etag_matches
+from .views import SparseFieldsViewMixin, ProjectIssueView
+
+
+def save_serializer(serializer, **kwargs):
+    """Validate and save serializer; returns (data, errors)"""
+    if not serializer.is_valid():
+        return None, serializer.errors
+    serializer.save(**kwargs)
+    return serializer.data, None
+
+
+class AsyncAPIView(View):
+    """
+    Base of the async views: JWT authentication, DRF request parsing and
+    JSON rendering, APIException handling and project ETags, as APIView and
+    ConditionalGetMixin do for the sync views.
+    """
+
+    authentication = CachedJWTAuthentication()
+    renderer = JSONRenderer()
+    pagination_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authentication, no session: exempt from CSRF like APIView
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.etag = None
+        request = Request(
+            request,
+            parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+            authenticators=(),
+        )
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+            request.user, request.auth = authenticated
+
+            response = await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            response = self.handle_exception(request, exc)
+
+        if self.etag is not None and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = self.etag
+        return response
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        # View's version returns a plain response, which dispatch cannot await
+        raise MethodNotAllowed(request.method)
+
+    def handle_exception(self, request, exc):
+        data = (
+            exc.detail
+            if isinstance(exc.detail, (list, dict))
+            else {"detail": exc.detail}
+        )
+        response = self.render(data, exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = self.authentication.authenticate_header(
+                request
+            )
+        elif exc.status_code == status.HTTP_405_METHOD_NOT_ALLOWED:
+            response["Allow"] = ", ".join(self._allowed_methods())
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type=self.renderer.media_type,
+        )
+
+    def render_response(self, response):
+        """HttpResponse of a DRF Response returned by shared sync code"""
+        rendered = self.render(response.data, response.status_code)
+        for name, value in response.items():
+            if name != "Content-Type":
+                rendered[name] = value
+        return rendered
+
+    def paginated(self, paginator, page):
+        return self.render(paginator.get_paginated_response(page).data)
+
+    async def not_modified(self, request, project_id, version=None):
+        if version is None:
+            version = await aget_project_version(project_id)
+        # project_etag would look the version up again, synchronously
+        self.etag = (
+            None if version is None else project_etag(request, project_id, version)
+        )
+
+        if etag_matches(request, self.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = self.etag
+            return response
+        return None
+
+    async def project_not_found(self, project_id, e=""):
+        """As myapp.views.project_not_found"""
+        await sync_to_async(invalidate_project_access)(project_id)
+        response = {"message": ("Projet non trouvé ! %s" % e).rstrip()}
+        return self.render(response, status.HTTP_404_NOT_FOUND)
+
+    async def get_member_access(self, request, project_id, not_found, forbidden):
+        """Return (access, None), or (None, error response)"""
+        try:
+            access = await aget_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": not_found + str(e)}
+            return None, self.render(response, status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": forbidden}
+            return None, self.render(response, status.HTTP_403_FORBIDDEN)
+
+        return access, None
+
+
+class AsyncProjectView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/"""
+
+    serializer_class = ProjectsSerializer
+    pagination_class = IdKeysetPagination
+
+    async def get(self, request, *args, **kwargs):
+        fields = self.get_requested_fields(request)
+        projects = await aserialized_projects(request.user.id, self.serializer_class)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_list(projects, Projects, request, view=self)
+        page = await aadd_counters(page)
+        if fields is not None:
+            page = [
+                {name: value for name, value in row.items() if name in fields}
+                for row in page
+            ]
+
+        return self.paginated(paginator, page)
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        data, errors = await sync_to_async(save_serializer)(
+            serializer, author_user_id=request.user
+        )
+        if errors is not None:
+            return self.render(errors, status.HTTP_400_BAD_REQUEST)
+
+        response = {"message": "Projet créé avec succès !", "data": data}
+        return self.render(response, status.HTTP_201_CREATED)
+
+
+class AsyncDetailProjectView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/<project_id>"""
+
+    serializer_class = ProjectsSerializer
+
+    async def get(self, request, project_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Projet non trouvé ! ",
+            "Vous n'avez pas accès à ce projet !",
+        )
+        if error is not None:
+            return error
+
+        fields = self.get_requested_fields(request)
+        try:
+            project = await project_queryset(
+                project_id, values_reader(self.serializer_class, fields).sources
+            ).aget()
+        except ObjectDoesNotExist as e:
+            return await self.project_not_found(project_id, e)
+
+        not_modified = await self.not_modified(request, project_id, project.version)
+        if not_modified is not None:
+            return not_modified
+
+        return self.render(self.serializer_class(project, fields=fields).data)
+
+
+class AsyncContributorsView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/<project_id>/users/"""
+
+    serializer_class = ContributorsSerializer
+    pagination_class = IdKeysetPagination
+
+    async def get(self, request, project_id, *args, **kwargs):
+        try:
+            project = await Projects.objects.only("id", "version").aget(id=project_id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        not_modified = await self.not_modified(request, project.id, project.version)
+        if not_modified is not None:
+            return not_modified
+
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_values(
+            contributors_queryset(project.id),
+            reader.columns,
+            request,
+            view=self,
+        )
+
+        if not page:
+            response = {"message": "Ce projet n'a pas de contributeurs."}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        return self.paginated(paginator, reader.to_representation(page))
+
+    async def post(self, request, project_id, *args, **kwargs):
+        try:
+            project = await Projects.objects.aget(id=project_id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        if not isinstance(request.data, dict):
+            response = {"message": "Le corps doit être un objet JSON."}
+            return self.render(response, status.HTTP_400_BAD_REQUEST)
+
+        already_contributor = await contributor_queryset(
+            project.id, request.data.get("user_id")
+        ).aexists()
+
+        errors = True
+        if not already_contributor and project.author_user_id_id == request.user.id:
+            serializer = self.serializer_class(data=request.data)
+            data, errors = await sync_to_async(save_serializer)(
+                serializer, project_id=project
+            )
+
+        if errors is not None:
+            response = {
+                "message": "Ce contributeur a déjà été ajouté ou vous n'êtes pas l'auteur de ce projet !",
+            }
+            return self.render(response, status.HTTP_403_FORBIDDEN)
+
+        response = {"message": "Contributeur ajouté avec succès !", "data": data}
+        return self.render(response, status.HTTP_201_CREATED)
+
+
+class AsyncProjectIssueView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/<project_id>/issues/"""
+
+    serializer_class = IssuesSerializer
+    pagination_class = CreatedTimeKeysetPagination
+    issue_filter = ProjectIssueView.issue_filter
+    bulk_max_items = ProjectIssueView.bulk_max_items
+    bulk_sync_max_items = ProjectIssueView.bulk_sync_max_items
+    post_many = ProjectIssueView.post_many
+
+    async def get(self, request, project_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Projet non trouvé ! ",
+            "Vous n'avez pas accès à ce projet !",
+        )
+        if error is not None:
+            return error
+
+        paginator = self.pagination_class()
+        issues = self.issue_filter.filter_queryset(request, issues_queryset(project_id))
+        paginator.ordering = self.issue_filter.get_ordering(request)
+
+        not_modified = await self.not_modified(request, project_id)
+        if not_modified is not None:
+            return not_modified
+        if self.etag is None:
+            # No version: the project is gone
+            return await self.project_not_found(project_id)
+
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        page = await paginator.apaginate_values(
+            issues, reader.columns, request, view=self
+        )
+        return self.paginated(paginator, reader.to_representation(page))
+
+    async def post(self, request, project_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Projet non trouvé ! ",
+            "Vous ne participez pas à ce projet : Accès non autorisé !",
+        )
+        if error is not None:
+            return error
+
+        if isinstance(request.data, list):
+            # Bulk creation, or a background job above bulk_sync_max_items
+            response = await sync_to_async(self.post_many)(
+                request.data, project_id, request.user
+            )
+            return self.render_response(response)
+
+        serializer = self.serializer_class(data=request.data)
+        try:
+            data, errors = await sync_to_async(save_serializer)(
+                serializer, project_id_id=project_id, author_user_id=request.user
+            )
+        except IntegrityError:
+            if await Projects.objects.filter(id=project_id).aexists():
+                raise
+            return await self.project_not_found(project_id)
+        if errors is not None:
+            return self.render(errors, status.HTTP_400_BAD_REQUEST)
+
+        response = {"message": "Problème créé avec succès !", "data": data}
+        return self.render(response, status.HTTP_201_CREATED)
+
+
+class AsyncIssueCommentView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/<project_id>/issues/<issue_id>/comments/"""
+
+    serializer_class = CommentsSerializer
+    pagination_class = CreatedTimeKeysetPagination
+
+    async def get(self, request, project_id, issue_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Problème ou projet non trouvé ! : ",
+            "Vous n'avez pas accès à ce projet !",
+        )
+        if error is not None:
+            return error
+
+        # The issue is checked before the ETag: a deleted issue is not "not
+        # modified"
+        version = await issue_version_queryset(project_id, issue_id).afirst()
+        if version is None:
+            response = {"message": "Problème ou projet non trouvé !"}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        not_modified = await self.not_modified(request, project_id, version)
+        if not_modified is not None:
+            return not_modified
+
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_values(
+            comments_queryset(issue_id),
+            reader.columns,
+            request,
+            view=self,
+        )
+
+        if not page:
+            response = {"message": "Il n'a pas encore de commentaire sur ce problème."}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        return self.paginated(paginator, reader.to_representation(page))
+
+    async def post(self, request, project_id, issue_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Projet non trouvé ! ",
+            "Vous ne participez pas à ce projet : Accès non autorisé !",
+        )
+        if error is not None:
+            return error
+
+        try:
+            issue = await (
+                issue_queryset(project_id, issue_id).only("id", "project_id").aget()
+            )
+        except ObjectDoesNotExist as e:
+            response = {"message": "Problème non trouvé ! " + str(e)}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        serializer = self.serializer_class(data=request.data)
+        data, errors = await sync_to_async(save_serializer)(
+            serializer, issue_id=issue, author_user_id=request.user
+        )
+        if errors is not None:
+            return self.render(errors, status.HTTP_400_BAD_REQUEST)
+
+        response = {"message": "Commentaire créé avec succès !", "data": data}
+        return self.render(response, status.HTTP_200_OK)
+
+
+class AsyncCommentView(SparseFieldsViewMixin, AsyncAPIView):
+    """View for /async/project/<project_id>/issues/<issue_id>/comments/<comment_id>"""
+
+    serializer_class = CommentsSerializer
+
+    async def get(self, request, project_id, issue_id, comment_id, *args, **kwargs):
+        _, error = await self.get_member_access(
+            request,
+            project_id,
+            "Projet, problème ou commentaire non trouvé ! : ",
+            "Vous ne participez pas à ce projet : Accès refusé !",
+        )
+        if error is not None:
+            return error
+
+        # The comment is checked before the ETag, as in AsyncIssueCommentView
+        version = await comment_version_queryset(
+            project_id, issue_id, comment_id
+        ).afirst()
+        if version is None:
+            response = {"message": "Projet, problème ou commentaire non trouvé !"}
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        not_modified = await self.not_modified(request, project_id, version)
+        if not_modified is not None:
+            return not_modified
+
+        fields = self.get_requested_fields(request)
+        try:
+            comment = await comment_queryset(
+                project_id,
+                issue_id,
+                comment_id,
+                values_reader(self.serializer_class, fields).sources,
+            ).aget()
+        except ObjectDoesNotExist as e:
+            response = {
+                "message": "Projet, problème ou commentaire non trouvé ! : " + str(e)
+            }
+            return self.render(response, status.HTTP_404_NOT_FOUND)
+
+        return self.render(self.serializer_class(comment, fields=fields).data)
@@ -0,0 +1,145 @@
+"""
+Sub-requests of POST /api/batch/, run in the process of the batch request.
+
+Each sub-request is a plain Django request for one of the routes of
+softdesk.urls, handed to its view as the URL resolver would. The user the
+batch request was authenticated as is forced on it, as
+rest_framework.test.force_authenticate does, so that the token is checked
+once per batch. The membership lookups go through myapp.access: the first
+sub-request on a project fills the cache the following ones read.
+"""
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.views import APIView
+
+logger = logging.getLogger("softdesk.batch")
+
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+# Routes that do not answer JSON or would nest batches
+EXCLUDED_URL_NAMES = {"batch", "project-export", "project-job-file"}
+
+# Request headers a sub-request may set; the others are the batch request's
+HEADERS = {"if-none-match": "HTTP_IF_NONE_MATCH"}
+# Response headers passed back to the client
+RESPONSE_HEADERS = ("ETag", "Location")
+
+
+class BatchItemError(Exception):
+    """A sub-request that cannot be run; args are (status, message)"""
+
+
+def build_request(request, item):
+    """The Django request described by item, a sub-request of request"""
+    if not isinstance(item, dict):
+        raise BatchItemError(
+            status.HTTP_400_BAD_REQUEST,
+            "Chaque requête doit être un objet {method, path, body, headers}.",
+        )
+
+    method = item.get("method", "GET")
+    path = item.get("path")
+    if not isinstance(method, str) or method.upper() not in METHODS:
+        raise BatchItemError(
+            status.HTTP_405_METHOD_NOT_ALLOWED, "Méthode %r non autorisée." % method
+        )
+    if not isinstance(path, str) or not path.startswith("/api/"):
+        raise BatchItemError(
+            status.HTTP_400_BAD_REQUEST, "Chemin %r invalide." % (path,)
+        )
+    headers = item.get("headers") or {}
+    if not isinstance(headers, dict):
+        raise BatchItemError(
+            status.HTTP_400_BAD_REQUEST, "Les en-têtes doivent être un objet."
+        )
+
+    url = urlsplit(path)
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        raise BatchItemError(status.HTTP_404_NOT_FOUND, "Chemin %r inconnu." % path)
+    view_class = getattr(match.func, "cls", None)
+    if (
+        match.url_name in EXCLUDED_URL_NAMES
+        or view_class is None
+        or not issubclass(view_class, APIView)
+    ):
+        raise BatchItemError(
+            status.HTTP_400_BAD_REQUEST,
+            "Chemin %r non disponible dans un lot." % path,
+        )
+
+    body = b""
+    if item.get("body") is not None:
+        body = json.dumps(item["body"]).encode()
+
+    sub = HttpRequest()
+    sub.method = method.upper()
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        key: value
+        for key, value in request.META.items()
+        if key not in HEADERS.values() and key != "HTTP_AUTHORIZATION"
+    }
+    sub.META.update(
+        REQUEST_METHOD=sub.method,
+        PATH_INFO=url.path,
+        QUERY_STRING=url.query,
+        CONTENT_TYPE="application/json",
+        CONTENT_LENGTH=str(len(body)),
+    )
+    for name, value in headers.items():
+        key = HEADERS.get(str(name).lower())
+        if key is not None:
+            sub.META[key] = str(value)
+    sub.GET = QueryDict(url.query)
+    sub._stream = BytesIO(body)
+    sub._read_started = False
+    sub.resolver_match = match
+
+    # Authenticated once, by the batch request
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub, match
+
+
+def run_request(request, item):
+    """{"status", "headers", "body"} of the sub-request item of request"""
+    try:
+        sub, match = build_request(request, item)
+        response = match.func(sub, *match.args, **match.kwargs)
+    except BatchItemError as e:
+        code, message = e.args
+        return {"status": code, "headers": {}, "body": {"message": message}}
+    except Exception:
+        # Reported like Django would, without failing the other sub-requests
+        logger.exception(
+            "batch sub-request %s %s failed", item.get("method", "GET"), item["path"]
+        )
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "headers": {},
+            "body": {"message": "Erreur interne du serveur."},
+        }
+
+    if hasattr(response, "data"):
+        body = response.data
+    elif not response.streaming and response.get("Content-Type", "").startswith(
+        "application/json"
+    ):
+        body = json.loads(response.content) if response.content else None
+    else:
+        return {
+            "status": status.HTTP_400_BAD_REQUEST,
+            "headers": {},
+            "body": {"message": "Réponse non disponible dans un lot."},
+        }
+
+    headers = {name: response[name] for name in RESPONSE_HEADERS if name in response}
+    return {"status": response.status_code, "headers": headers, "body": body}
@@ -0,0 +1,151 @@
+"""
+Per-project change log for client sync.
+
+Every insert, update and delete of an issue, comment or contributor appends
+an entry (project_id, seq, kind, object_id, deleted) to myapp_changes from a
+SQLite trigger, in the writing transaction, seq being the project's
+change_seq incremented by the same trigger. A client keeps the last seq it
+has seen and asks for the entries after it: only the objects changed since
+are sent, each once, in its current state.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Projects, Changes
+from .serializers import (
+    values_reader,
+    ContributorsSerializer,
+    IssuesSerializer,
+    CommentsSerializer,
+)
+
+DEFAULT_RETENTION_DAYS = 30
+
+# kind -> (key of the response, serializer, lookup of the project id)
+KINDS = {
+    Changes.ISSUE: ("issues", IssuesSerializer, "project_id"),
+    Changes.COMMENT: ("comments", CommentsSerializer, "issue_id__project_id"),
+    Changes.CONTRIBUTOR: ("contributors", ContributorsSerializer, "project_id"),
+}
+
+
+class ChangesGone(Exception):
+    """The entries after since were compacted: the client has to resync"""
+
+
+def get_retention():
+    return timedelta(
+        days=getattr(
+            settings, "SOFTDESK_CHANGE_LOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS
+        )
+    )
+
+
+def changes_since(project_id, since, limit):
+    """
+    The objects of project_id changed after seq since, at most limit log
+    entries at a time: {"seq", "more", "<kind>s": [rows], "deleted": {...}}.
+    The next call starts from the returned seq. Without since, only the
+    current seq is returned: the starting point of a full download.
+    """
+    # Every read on the same database: replicas lag by different amounts
+    using = router.db_for_read(Changes)
+    change_seq, change_floor = (
+        Projects.objects.using(using)
+        .filter(id=project_id)
+        .values_list("change_seq", "change_floor")
+        .get()
+    )
+    if change_seq is None:
+        # Being deleted
+        raise Projects.DoesNotExist()
+    if since is None:
+        since = change_seq
+    elif since < change_floor:
+        raise ChangesGone(change_floor)
+
+    # A since past change_seq (seq read on a fresher database) finds nothing
+    entries = list(
+        Changes.objects.using(using)
+        .filter(project_id=project_id, seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the last entry of an object counts
+    latest = {}
+    for seq, kind, object_id, deleted in entries:
+        latest[(kind, object_id)] = deleted
+
+    response = {
+        "seq": entries[-1][0] if entries else since,
+        "more": more,
+    }
+    deleted_ids = {}
+    for kind, (key, serializer_class, project_lookup) in KINDS.items():
+        changed = [
+            object_id
+            for (entry_kind, object_id), deleted in latest.items()
+            if entry_kind == kind and not deleted
+        ]
+        gone = {
+            object_id
+            for (entry_kind, object_id), deleted in latest.items()
+            if entry_kind == kind and deleted
+        }
+
+        rows = []
+        if changed:
+            model = serializer_class.Meta.model
+            rows = values_reader(serializer_class).read(
+                model.objects.using(using)
+                .filter(id__in=changed, **{project_lookup: project_id})
+                .order_by("id")
+            )
+            # Deleted or moved after the last entry read
+            gone.update(set(changed) - {row["id"] for row in rows})
+
+        response[key] = rows
+        deleted_ids[key] = sorted(gone)
+
+    response["deleted"] = deleted_ids
+    return response
+
+
+def compact_changes(retention=None):
+    """
+    Drop the entries superseded by a later entry of the same object, then
+    the entries older than retention, raising the change_floor of their
+    projects. Returns the number of entries removed by each step.
+    """
+    retention = get_retention() if retention is None else retention
+
+    later = Changes.objects.filter(
+        project_id=OuterRef("project_id"),
+        kind=OuterRef("kind"),
+        object_id=OuterRef("object_id"),
+        seq__gt=OuterRef("seq"),
+    )
+    superseded, _ = Changes.objects.filter(Exists(later)).delete()
+
+    expired = Changes.objects.filter(created_time__lt=timezone.now() - retention)
+    with transaction.atomic():
+        last_expired = (
+            expired.filter(project_id=OuterRef("pk"))
+            .values("project_id")
+            .annotate(seq=Max("seq"))
+            .values("seq")
+        )
+        Projects.objects.filter(
+            Exists(expired.filter(project_id=OuterRef("pk")))
+        ).update(change_floor=Greatest(F("change_floor"), Subquery(last_expired)))
+        expired_count, _ = expired.delete()
+
+    return superseded, expired_count
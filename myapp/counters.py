@@ -0,0 +1,142 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Projects, Issues, Comments
+from .versioning import bump_projects_version
+
+DEFAULT_CLOSED_STATUSES = ["Terminé"]
+
+
+def closed_statuses():
+    return list(
+        getattr(settings, "SOFTDESK_CLOSED_ISSUE_STATUSES", DEFAULT_CLOSED_STATUSES)
+    )
+
+
+def is_open(status):
+    return status not in closed_statuses()
+
+
+def adjust(queryset, **deltas):
+    """Add deltas to counter columns with one UPDATE, never going below 0"""
+    changes = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+        if delta
+    }
+    if changes:
+        queryset.update(**changes)
+
+
+def adjust_project(project_id, issues=0, open_issues=0):
+    # The cached project lists leave the counters out (see project_cache)
+    adjust(
+        Projects.objects.filter(id=project_id),
+        issue_count=issues,
+        open_issue_count=open_issues,
+    )
+
+
+def issue_state_changed(old_state, new_state):
+    """
+    Move an issue between the counters of its (project_id, status) states;
+    None stands for a missing issue (creation or deletion).
+    """
+    if old_state == new_state:
+        return
+
+    if old_state is not None and new_state is not None and old_state[0] == new_state[0]:
+        adjust_project(
+            new_state[0], open_issues=is_open(new_state[1]) - is_open(old_state[1])
+        )
+        return
+
+    if old_state is not None:
+        adjust_project(old_state[0], issues=-1, open_issues=-is_open(old_state[1]))
+    if new_state is not None:
+        adjust_project(new_state[0], issues=1, open_issues=is_open(new_state[1]))
+
+
+def count_new_issues(issues):
+    """Counters of issues inserted without signals (bulk_create)"""
+    totals = Counter()
+    opened = Counter()
+    for issue in issues:
+        totals[issue.project_id_id] += 1
+        opened[issue.project_id_id] += is_open(issue.status)
+
+    for project_id, count in totals.items():
+        adjust_project(project_id, issues=count, open_issues=opened[project_id])
+
+
+def adjust_comment_count(issue_id, delta):
+    adjust(Issues.objects.filter(id=issue_id), comment_count=delta)
+
+
+def count_subquery(queryset, group_by):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_by: OuterRef("pk")})
+            .order_by()
+            .values(group_by)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def reconcile_counters(project_ids=None, batch_size=500):
+    """
+    Recompute the counters of the projects (all of them by default) and of
+    their issues from the rows. Returns the number of projects and issues
+    whose counters had drifted.
+    """
+    projects = Projects.objects.all()
+    issues = Issues.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(id__in=project_ids)
+        issues = issues.filter(project_id__in=project_ids)
+
+    project_counts = {
+        "issue_count": count_subquery(Issues.objects.all(), "project_id"),
+        "open_issue_count": count_subquery(
+            Issues.objects.exclude(status__in=closed_statuses()), "project_id"
+        ),
+    }
+    issue_counts = {
+        "comment_count": count_subquery(Comments.objects.all(), "issue_id"),
+    }
+
+    fixed = []
+    with transaction.atomic():
+        for queryset, counts in [(projects, project_counts), (issues, issue_counts)]:
+            drifted = list(
+                queryset.annotate(
+                    **{"actual_" + field: count for field, count in counts.items()}
+                )
+                .exclude(**{field: F("actual_" + field) for field in counts})
+                .values_list("id", flat=True)
+            )
+            for start in range(0, len(drifted), batch_size):
+                queryset.model.objects.filter(
+                    id__in=drifted[start : start + batch_size]
+                ).update(**counts)
+            fixed.append(drifted)
+
+    drifted_projects, drifted_issues = fixed
+    changed_project_ids = set(drifted_projects)
+    for start in range(0, len(drifted_issues), batch_size):
+        changed_project_ids.update(
+            Issues.objects.filter(
+                id__in=drifted_issues[start : start + batch_size]
+            ).values_list("project_id", flat=True)
+        )
+
+    bump_projects_version(changed_project_ids, batch_size)
+
+    return len(drifted_projects), len(drifted_issues)
@@ -0,0 +1,24 @@
+from django.conf import settings
+
+
+def get_profile(name=None):
+    """The SOFTDESK_DATABASE_PROFILES entry in use, or the one named"""
+    return settings.SOFTDESK_DATABASE_PROFILES[
+        name or settings.SOFTDESK_DATABASE_PROFILE
+    ]
+
+
+def configure_connection(connection):
+    """
+    Run the PRAGMAS of the active profile on a new SQLite connection.
+
+    They go through the raw sqlite3 connection so that they are neither
+    logged nor seen by execute wrappers counting the queries of a request.
+    busy_timeout comes first so that switching the journal mode waits for
+    the other connections instead of failing.
+    """
+    if connection.vendor != "sqlite":
+        return
+
+    for name, value in get_profile()["PRAGMAS"].items():
+        connection.connection.execute("PRAGMA %s = %s" % (name, value))
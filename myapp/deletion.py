@@ -0,0 +1,121 @@
+"""
+Set-based project deletion.
+
+Model.delete() has Django's Collector load every issue and comment of the
+project to emulate ON DELETE CASCADE and send their signals. Here each table
+is emptied with one DELETE per table, children first; the search index
+follows through its SQLite triggers, the change log is switched off then
+emptied like the other tables, and the caches the signals would have
+invalidated are invalidated once at the end.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .access import invalidate_project_access
+from .counters import reconcile_counters
+from .models import Projects, Contributors, Issues
+from .project_cache import invalidate_user_projects
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Ids of the rows of each table that belong to the project, children first
+PROJECT_ROWS = [
+    (
+        "myapp_comments",
+        "SELECT c.id FROM myapp_comments c "
+        "INNER JOIN myapp_issues i ON i.id = c.issue_id_id "
+        "WHERE i.project_id_id = %s",
+    ),
+    ("myapp_issues", "SELECT id FROM myapp_issues WHERE project_id_id = %s"),
+    (
+        "myapp_contributors",
+        "SELECT id FROM myapp_contributors WHERE project_id_id = %s",
+    ),
+    ("myapp_changes", "SELECT id FROM myapp_changes WHERE project_id = %s"),
+]
+
+
+def get_chunk_size():
+    return getattr(settings, "SOFTDESK_PROJECT_DELETE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+
+def project_size(project):
+    """Number of issue and comment rows deleting project removes"""
+    comments = (
+        Issues.objects.using(connection.alias)
+        .filter(project_id=project.id)
+        .aggregate(total=Sum("comment_count"))["total"]
+    )
+    return project.issue_count + (comments or 0)
+
+
+def delete_rows(cursor, table, select, project_id, limit=None):
+    sql = "DELETE FROM %s WHERE id IN (%s" % (table, select)
+    params = [project_id]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(sql + ")", params)
+    return cursor.rowcount
+
+
+def delete_project(project, chunk_size=None):
+    """
+    Delete project with its contributors, issues and comments; returns the
+    number of rows deleted per table.
+
+    Projects of up to chunk_size issues and comments go in a single
+    transaction. Larger ones are emptied chunk_size rows per transaction,
+    so that the SQLite write lock is released between chunks, and the rows
+    left (added meanwhile) go with the project row in a last transaction.
+    Readers may see such a project partly emptied until it is gone.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    # Stops the change log triggers from logging every row deleted below;
+    # the last seq is kept in change_floor for restore_project
+    Projects.objects.filter(id=project.id, change_seq__isnull=False).update(
+        change_floor=F("change_seq"), change_seq=None
+    )
+    # Read on the connection the deletes run on, never on a read replica
+    member_ids = set(
+        Contributors.objects.using(connection.alias)
+        .filter(project_id=project.id)
+        .values_list("user_id", flat=True)
+    )
+    member_ids.add(project.author_user_id_id)
+
+    deleted = {table: 0 for table, _ in PROJECT_ROWS}
+    if project_size(project) > chunk_size:
+        for table, select in PROJECT_ROWS:
+            while True:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    count = delete_rows(cursor, table, select, project.id, chunk_size)
+                deleted[table] += count
+                if count < chunk_size:
+                    break
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, select in PROJECT_ROWS:
+            deleted[table] += delete_rows(cursor, table, select, project.id)
+        cursor.execute("DELETE FROM myapp_projects WHERE id = %s", [project.id])
+        deleted["myapp_projects"] = cursor.rowcount
+
+    invalidate_project_access(project.id)
+    invalidate_user_projects(*member_ids)
+    return deleted
+
+
+def restore_project(project_id):
+    """
+    Reopen a project whose deletion failed for good, possibly partly
+    emptied: its change log starts again one seq past the last one, so that
+    every client gets 410 and reloads it, and its counters are recomputed.
+    """
+    restored = Projects.objects.filter(id=project_id, change_seq__isnull=True).update(
+        change_seq=F("change_floor") + 1, change_floor=F("change_floor") + 1
+    )
+    if restored:
+        reconcile_counters([project_id])
+        invalidate_project_access(project_id)
+    return restored
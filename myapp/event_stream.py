@@ -0,0 +1,165 @@
+"""
+Server-Sent Events stream of a project's issue and comment changes, served
+at api/async/projects/<project_id>/events/ by softdesk.asgi.
+
+Django 4.1 iterates streaming responses synchronously under ASGI, which
+would hold the event loop for as long as a client stays connected, so the
+stream is a small ASGI application of its own in front of Django's. It
+authenticates and checks the membership as the async views do, then sends
+the events of myapp.events.hub until the client disconnects. A client
+reconnecting with Last-Event-ID (or ?since=<seq>) first gets the events it
+missed.
+"""
+import asyncio
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+
+from authentication.authentication import CachedJWTAuthentication
+from .access import aget_project_access
+from .events import hub, renderer
+
+PATH = re.compile(r"^/api/async/projects/(?P<project_id>[0-9]+)/events/$")
+
+DEFAULT_HEARTBEAT = 15.0
+# Delay before the browser's EventSource reconnects, in milliseconds
+RETRY = 3000
+
+
+class EventStreamRouter:
+    """ASGI application sending event stream requests to EventStream"""
+
+    def __init__(self, application):
+        self.application = application
+        self.stream = EventStream()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            match = PATH.match(scope["path"])
+            if match is not None:
+                project_id = int(match.group("project_id"))
+                return await self.stream(scope, receive, send, project_id)
+        return await self.application(scope, receive, send)
+
+
+class EventStream:
+    """The event stream of one project, for one authenticated member"""
+
+    authentication = CachedJWTAuthentication()
+
+    def __init__(self, heartbeat=None):
+        self.heartbeat = heartbeat or getattr(
+            settings, "SOFTDESK_EVENTS_HEARTBEAT", DEFAULT_HEARTBEAT
+        )
+
+    async def __call__(self, scope, receive, send, project_id):
+        request = ASGIRequest(scope, BytesIO())
+        if request.method != "GET":
+            response = {"detail": 'Méthode "%s" non autorisée.' % request.method}
+            return await self.send_json(
+                send, response, status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            return await self.send_json(
+                send, {"detail": exc.detail}, exc.status_code, request
+            )
+        user = authenticated[0]
+
+        try:
+            access = await aget_project_access(project_id, user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return await self.send_json(send, response, status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
+            return await self.send_json(send, response, status.HTTP_403_FORBIDDEN)
+
+        since = request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("since")
+        try:
+            since = None if since is None else int(since)
+        except ValueError:
+            response = {"message": "Numéro de séquence since invalide."}
+            return await self.send_json(send, response, status.HTTP_400_BAD_REQUEST)
+
+        subscription, replay = await hub.subscribe(project_id, user.id, since)
+        try:
+            await self.stream(receive, send, subscription, replay)
+        finally:
+            hub.unsubscribe(subscription)
+
+    async def stream(self, receive, send, subscription, replay):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_200_OK,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    # Unbuffered behind nginx
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        next_event = None
+        try:
+            await self.send_body(send, b"retry: %d\n\n" % RETRY + b"".join(replay))
+
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {next_event, disconnected},
+                    timeout=self.heartbeat,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    return
+                if next_event not in done:
+                    # Keeps proxies from closing an idle connection
+                    await self.send_body(send, b": keepalive\n\n")
+                    continue
+
+                body, next_event = next_event.result(), None
+                if body is None:
+                    break
+                await self.send_body(send, body)
+
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            # Client gone while sending
+            pass
+        finally:
+            disconnected.cancel()
+            if next_event is not None:
+                next_event.cancel()
+
+    async def wait_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def send_body(self, send, body):
+        await send({"type": "http.response.body", "body": body, "more_body": True})
+
+    async def send_json(self, send, data, status_code, request=None):
+        headers = [(b"content-type", renderer.media_type.encode())]
+        if status_code == status.HTTP_401_UNAUTHORIZED and request is not None:
+            header = self.authentication.authenticate_header(request)
+            headers.append((b"www-authenticate", header.encode()))
+        await send(
+            {"type": "http.response.start", "status": status_code, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": renderer.render(data)})
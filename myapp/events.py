@@ -0,0 +1,349 @@
+"""
+Fan-out of issue and comment changes to the Server-Sent Events streams of
+myapp.event_stream.
+
+Each ASGI process has one EventHub. Its poller task reads the change_seq of
+the subscribed projects with one query per poll_interval, whatever the
+number of subscribers, and only reads the change log (myapp.changes) of the
+projects that moved. Each new entry is rendered once and queued to every
+subscriber of its project. Writes made by another process are therefore
+seen within poll_interval; writes made by this one wake the poller up at
+commit (see signals), so that their events are sent right away.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from rest_framework.renderers import JSONRenderer
+
+from .changes import KINDS, ChangesGone
+from .models import Projects, Contributors, Changes
+from .serializers import values_reader
+
+logger = logging.getLogger("softdesk.events")
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_REPLAY_MAX = 1000
+# Projects per query of the poller, below SQLite's variable limit
+POLL_CHUNK_SIZE = 500
+
+# Kinds streamed to clients; contributor changes only re-check the access
+STREAMED_KINDS = (Changes.ISSUE, Changes.COMMENT)
+
+renderer = JSONRenderer()
+
+
+def render_event(event, data, seq=None):
+    """One event in the text/event-stream format"""
+    lines = []
+    if seq is not None:
+        lines.append(b"id: %d" % seq)
+    lines.append(b"event: " + event.encode())
+    lines.append(b"data: " + renderer.render(data))
+    return b"\n".join(lines) + b"\n\n"
+
+
+def reset_event(seq):
+    return render_event(
+        "reset",
+        {
+            "message": "Historique compacté : rechargez le projet.",
+            "seq": seq,
+        },
+        seq,
+    )
+
+
+def project_deleted_event():
+    return render_event("project.deleted", {"message": "Projet supprimé."})
+
+
+def read_events(project_id, since, until, limit=None):
+    """
+    Rendered events of the project's change log entries in (since, until].
+    Entries of the same object are merged into one event carrying its
+    current state. Raises ChangesGone when there are more than limit
+    entries. Returns (events, whether contributors changed).
+    """
+    entries = list(
+        Changes.objects.using(DEFAULT_DB_ALIAS)
+        .filter(project_id=project_id, seq__gt=since, seq__lte=until)
+        .order_by("seq")
+        .values_list("seq", "kind", "object_id", "deleted", "created")
+    )
+    if limit is not None and len(entries) > limit:
+        raise ChangesGone(until)
+
+    latest = {}
+    created = set()
+    members_changed = False
+    for seq, kind, object_id, deleted, is_creation in entries:
+        if kind not in STREAMED_KINDS:
+            members_changed = True
+            continue
+        # Re-inserted last, so that latest stays ordered by seq
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = (seq, deleted)
+        if is_creation:
+            created.add((kind, object_id))
+
+    rows = {}
+    for kind in STREAMED_KINDS:
+        ids = [
+            object_id
+            for (entry_kind, object_id), (_, deleted) in latest.items()
+            if entry_kind == kind and not deleted
+        ]
+        if ids:
+            _, serializer_class, project_lookup = KINDS[kind]
+            model = serializer_class.Meta.model
+            for row in values_reader(serializer_class).read(
+                model.objects.using(DEFAULT_DB_ALIAS).filter(
+                    id__in=ids, **{project_lookup: project_id}
+                )
+            ):
+                rows[(kind, row["id"])] = row
+
+    events = []
+    for (kind, object_id), (seq, deleted) in latest.items():
+        data = {"id": object_id, "seq": seq}
+        if deleted:
+            action = "deleted"
+        elif (kind, object_id) not in rows:
+            # Deleted since: its own entry follows
+            continue
+        else:
+            action = "created" if (kind, object_id) in created else "updated"
+            data["data"] = rows[(kind, object_id)]
+        events.append(render_event("%s.%s" % (kind, action), data, seq))
+
+    return events, members_changed
+
+
+def read_positions(project_ids):
+    """{project_id: (change_seq, change_floor)} of the projects that exist"""
+    project_ids = list(project_ids)
+    positions = {}
+    for start in range(0, len(project_ids), POLL_CHUNK_SIZE):
+        rows = (
+            Projects.objects.using(DEFAULT_DB_ALIAS)
+            .filter(id__in=project_ids[start : start + POLL_CHUNK_SIZE])
+            .values_list("id", "change_seq", "change_floor")
+        )
+        positions.update((row[0], row[1:]) for row in rows)
+    return positions
+
+
+def read_members(project_id):
+    members = set(
+        Contributors.objects.using(DEFAULT_DB_ALIAS)
+        .filter(project_id=project_id)
+        .values_list("user_id", flat=True)
+    )
+    members.update(
+        Projects.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id=project_id)
+        .values_list("author_user_id", flat=True)
+    )
+    return members
+
+
+def read_updates(positions):
+    """
+    Poll of the projects at the given positions: {project_id: update},
+    update being None for a deleted project, else (change_seq, events,
+    members or None when unchanged).
+    """
+    close_old_connections()
+    current = read_positions(positions)
+
+    updates = {}
+    for project_id, position in positions.items():
+        change_seq, change_floor = current.get(project_id, (None, None))
+        if change_seq is None:
+            updates[project_id] = None
+            continue
+        if change_seq <= position:
+            continue
+
+        if position < change_floor:
+            # Compacted before this process read it (poller stalled)
+            events, members_changed = [reset_event(change_seq)], True
+        else:
+            events, members_changed = read_events(project_id, position, change_seq)
+        members = read_members(project_id) if members_changed else None
+        updates[project_id] = (change_seq, events, members)
+    return updates
+
+
+def read_start(project_id):
+    """change_seq of the project, None once deleted"""
+    close_old_connections()
+    return read_positions([project_id]).get(project_id, (None, None))[0]
+
+
+def read_replay(project_id, since, until, limit):
+    """Events of (since, until] for a client reconnecting after seq since"""
+    close_old_connections()
+    change_floor = (
+        Projects.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id=project_id)
+        .values_list("change_floor", flat=True)
+        .first()
+    )
+    if change_floor is None:
+        # Deleted: the poller closes the stream
+        return []
+    if since < change_floor:
+        return [reset_event(until)]
+
+    try:
+        events, _ = read_events(project_id, since, until, limit)
+    except ChangesGone:
+        return [reset_event(until)]
+    return events
+
+
+class Subscription:
+    """Events queued for one client stream; None marks the end"""
+
+    def __init__(self, project_id, user_id, maxsize):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def push(self, event):
+        """Queue event; a client too slow to keep up is disconnected"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # It reconnects with Last-Event-ID and gets the events it missed
+            logger.info("event stream of user %s lagging behind", self.user_id)
+            self.close()
+
+    def close(self, event=None):
+        if self.closed:
+            return
+        self.closed = True
+        # Room for event and the end mark
+        while self.queue.qsize() + (event is not None) >= self.queue.maxsize > 0:
+            self.queue.get_nowait()
+        if event is not None:
+            self.queue.put_nowait(event)
+        self.queue.put_nowait(None)
+
+
+class EventHub:
+    def __init__(self, poll_interval, queue_size, replay_max):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.replay_max = replay_max
+        self.subscriptions = {}
+        self.positions = {}
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+
+    async def subscribe(self, project_id, user_id, since=None):
+        """
+        Register a stream on project_id; returns the subscription and the
+        events to send before the queued ones, since being the last seq the
+        client has seen, if any.
+        """
+        subscription = Subscription(project_id, user_id, self.queue_size)
+        position = self.positions.get(project_id)
+        if position is None:
+            position = await sync_to_async(read_start)(project_id)
+            if position is None:
+                subscription.close(project_deleted_event())
+                return subscription, []
+            position = self.positions.setdefault(project_id, position)
+
+        # No await since the position was read: the events queued from now
+        # on are the ones after it
+        self.subscriptions.setdefault(project_id, set()).add(subscription)
+        self.start()
+
+        replay = []
+        if since is not None and since < position:
+            replay = await sync_to_async(read_replay)(
+                project_id, since, position, self.replay_max
+            )
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.project_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.project_id]
+            self.positions.pop(subscription.project_id, None)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self.run())
+
+    def wake(self):
+        """Poll now; callable from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        while self.subscriptions:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("event poll failed")
+
+    async def poll(self):
+        positions = dict(self.positions)
+        if not positions:
+            return
+        updates = await sync_to_async(read_updates)(positions)
+
+        for project_id, update in updates.items():
+            subscriptions = self.subscriptions.get(project_id)
+            if not subscriptions or self.positions.get(project_id) != (
+                positions[project_id]
+            ):
+                continue
+
+            if update is None:
+                for subscription in list(subscriptions):
+                    subscription.close(project_deleted_event())
+                    self.unsubscribe(subscription)
+                continue
+
+            change_seq, events, members = update
+            self.positions[project_id] = change_seq
+            for subscription in list(subscriptions):
+                if members is not None and subscription.user_id not in members:
+                    subscription.close()
+                    self.unsubscribe(subscription)
+                    continue
+                for event in events:
+                    subscription.push(event)
+
+
+hub = EventHub(
+    getattr(settings, "SOFTDESK_EVENTS_POLL_INTERVAL", DEFAULT_POLL_INTERVAL),
+    getattr(settings, "SOFTDESK_EVENTS_QUEUE_SIZE", DEFAULT_QUEUE_SIZE),
+    getattr(settings, "SOFTDESK_EVENTS_REPLAY_MAX", DEFAULT_REPLAY_MAX),
+)
@@ -0,0 +1,98 @@
+import json
+from itertools import islice
+
+from .models import Contributors, Issues, Comments
+from .serializers import (
+    ProjectsSerializer,
+    ContributorsSerializer,
+    IssuesSerializer,
+    CommentsSerializer,
+    values_reader,
+)
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def dumps(data):
+    # Same encoding as rest_framework's JSONRenderer
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def project_sections(project):
+    """(name, serializer_class, queryset) for every table of the export"""
+    return [
+        (
+            "contributors",
+            ContributorsSerializer,
+            Contributors.objects.filter(project_id=project).order_by("id"),
+        ),
+        (
+            "issues",
+            IssuesSerializer,
+            Issues.objects.filter(project_id=project).order_by("id"),
+        ),
+        (
+            "comments",
+            CommentsSerializer,
+            Comments.objects.filter(issue_id__project_id=project).order_by("id"),
+        ),
+    ]
+
+
+def iter_rows(serializer_class, queryset, chunk_size):
+    """Serialized rows read with a server-side cursor, chunk_size at a time"""
+    reader = values_reader(serializer_class)
+    rows = queryset.values_list(*reader.columns).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from reader.to_representation(chunk)
+
+
+def iter_project_ndjson(project, chunk_size=CHUNK_SIZE):
+    """One {"type": ..., "data": ...} line per row"""
+    yield dumps({"type": "project", "data": ProjectsSerializer(project).data}) + "\n"
+
+    for name, serializer_class, queryset in project_sections(project):
+        record_type = name[:-1]
+        for row in iter_rows(serializer_class, queryset, chunk_size):
+            yield dumps({"type": record_type, "data": row}) + "\n"
+
+
+def iter_project_json(project, chunk_size=CHUNK_SIZE):
+    """A single JSON document: the project with one array per table"""
+    yield '{"project":' + dumps(ProjectsSerializer(project).data)
+
+    for name, serializer_class, queryset in project_sections(project):
+        yield ',"%s":[' % name
+        separator = ""
+        for row in iter_rows(serializer_class, queryset, chunk_size):
+            yield separator + dumps(row)
+            separator = ","
+        yield "]"
+
+    yield "}"
+
+
+def buffered(parts, size=BUFFER_SIZE):
+    """Group small string parts so the server writes ~size characters at once"""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+# ?output= value -> (content type, file extension, iterator of the document)
+FORMATS = {
+    "json": ("application/json", "json", iter_project_json),
+    "ndjson": ("application/x-ndjson", "ndjson", iter_project_ndjson),
+}
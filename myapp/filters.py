@@ -0,0 +1,83 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import DateTimeField
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+# Query parameters read by the views themselves, never treated as filters
+RESERVED_PARAMS = frozenset(["cursor", "page_size", "fields", "ordering", "format"])
+
+
+class QueryParamsFilter:
+    """
+    Filtering and ordering of a queryset from whitelisted query parameters.
+
+    filters maps a query parameter to a model field lookup; a comma-separated
+    value of an "exact" filter becomes an __in lookup. orderings lists the
+    fields accepted by ?ordering= (prefixed with "-" for descending), "id"
+    being appended to keep the ordering unique for keyset pagination.
+    Unknown parameters and invalid values answer 400.
+    """
+
+    ordering_param = "ordering"
+
+    def __init__(self, model, filters, orderings, default_ordering):
+        self.model = model
+        self.filters = filters
+        self.orderings = orderings
+        self.default_ordering = default_ordering
+
+    def filter_queryset(self, request, queryset):
+        unknown = set(request.query_params) - set(self.filters) - RESERVED_PARAMS
+        if unknown:
+            raise ValidationError(
+                {"message": "Paramètre(s) inconnu(s) : " + ", ".join(sorted(unknown))}
+            )
+
+        lookups = {}
+        for param, lookup in self.filters.items():
+            if param not in request.query_params:
+                continue
+            field_name, _, lookup_type = lookup.partition("__")
+            field = self.model._meta.get_field(field_name)
+
+            values = request.query_params[param].split(",")
+            if lookup_type:
+                values = values[:1]
+            try:
+                values = [self.to_python(field, value.strip()) for value in values]
+            except DjangoValidationError:
+                raise ValidationError({param: ["Valeur invalide."]})
+
+            if lookup_type:
+                lookups[lookup] = values[0]
+            elif len(values) == 1:
+                lookups[field_name] = values[0]
+            else:
+                lookups[field_name + "__in"] = values
+
+        return queryset.filter(**lookups)
+
+    def to_python(self, field, value):
+        value = field.to_python(value)
+        if value is None or value == "":
+            raise DjangoValidationError("empty")
+        if isinstance(field, DateTimeField) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering is None:
+            return self.default_ordering
+
+        if ordering.lstrip("-") not in self.orderings:
+            raise ValidationError(
+                {
+                    self.ordering_param: [
+                        "Tri inconnu, valeurs possibles : " + ", ".join(self.orderings)
+                    ]
+                }
+            )
+        if ordering.lstrip("-") == "id":
+            return (ordering,)
+        return (ordering, "-id" if ordering.startswith("-") else "id")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+from contextvars import ContextVar
+from random import random
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger("softdesk.timing")
+
+_current_metrics = ContextVar("softdesk_request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "db_time", "serializer_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def get_sample_rate():
+    return float(getattr(settings, "SOFTDESK_TIMING_SAMPLE_RATE", 0))
+
+
+def install_query_recorder(connection):
+    """
+    Add record_query to the connection when sampling is on, once per
+    connection object (it survives reconnections). Installed on every
+    connection as it opens, whatever the thread: the async views' queries run
+    on the connections of the sync_to_async thread, where the metrics of the
+    request follow them through the context variable.
+    """
+    if get_sample_rate() > 0 and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+class InstrumentedSerializerMixin:
+    """Adds the time spent building serializer.data to the sampled request"""
+
+    @property
+    def data(self):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return super().data
+
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics.serializer_time += perf_counter() - start
+
+
+class InstrumentedListSerializer(InstrumentedSerializerMixin, ListSerializer):
+    pass
+
+
+class RequestTimingMiddleware:
+    """
+    Records SQL query count, DB time, serializer time and wall time of a
+    sample of the requests, sent back as a Server-Timing header and logged as
+    one JSON line on the "softdesk.timing" logger.
+
+    Disabled (removed from the middleware chain) when
+    SOFTDESK_TIMING_SAMPLE_RATE is 0. Async capable, so that it does not
+    move the async views back to a thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = get_sample_rate()
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if self.sample_rate < 1 and random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    async def __acall__(self, request):
+        if self.sample_rate < 1 and random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    def finish(self, request, response, metrics, wall_time):
+        response["Server-Timing"] = ", ".join(
+            [
+                'db;dur=%.2f;desc="%d queries"'
+                % (metrics.db_time * 1000, metrics.queries),
+                "ser;dur=%.2f" % (metrics.serializer_time * 1000),
+                "total;dur=%.2f" % (wall_time * 1000),
+            ]
+        )
+
+        resolver_match = getattr(request, "resolver_match", None)
+        logger.info(
+            json.dumps(
+                {
+                    "url_name": resolver_match.view_name if resolver_match else None,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "queries": metrics.queries,
+                    "db_ms": round(metrics.db_time * 1000, 2),
+                    "serializer_ms": round(metrics.serializer_time * 1000, 2),
+                    "wall_ms": round(wall_time * 1000, 2),
+                }
+            )
+        )
+        return response
@@ -0,0 +1,27 @@
+"""
+Entry points of the run_jobs process pool. Kept free of model imports at
+module level: a spawned process imports this module before Django is set
+up.
+"""
+import signal
+
+
+def init_process():
+    # Ctrl+C reaches the whole process group: let the pool finish the job
+    # at hand, run_jobs stops handing out new ones
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import django
+
+    django.setup()
+
+
+def run_job(job_id):
+    from django.db import connections
+
+    from .jobs import run
+
+    try:
+        return run(job_id)
+    finally:
+        connections.close_all()
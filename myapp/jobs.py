@@ -0,0 +1,201 @@
+"""
+Background jobs kept in the Jobs table and run by manage.py run_jobs.
+
+Views enqueue() a job and answer 202 right away; a worker claims ready jobs
+with a conditional UPDATE, so that several workers never run the same job,
+and runs the handler registered for its kind. A failed attempt is retried
+with an exponential delay until max_attempts. A job left running past the
+lease (worker killed) is claimed again.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Jobs
+
+logger = logging.getLogger("softdesk.jobs")
+
+DEFAULT_LEASE = 600
+DEFAULT_RETRY_DELAY = 10
+DEFAULT_MAX_ATTEMPTS = 3
+
+handlers = {}
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a handler for a failure that retrying will not fix; result, if
+    any, is stored on the job (validation errors for instance).
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def job(kind, max_attempts=DEFAULT_MAX_ATTEMPTS, on_failure=None):
+    """
+    Register the decorated function as the handler of kind; on_failure(job)
+    is called once the job has failed for good, to undo partial work
+    """
+
+    def register(handler):
+        handler.max_attempts = max_attempts
+        handler.on_failure = on_failure
+        handlers[kind] = handler
+        return handler
+
+    return register
+
+
+def get_lease():
+    return getattr(settings, "SOFTDESK_JOB_LEASE", DEFAULT_LEASE)
+
+
+def get_retry_delay(attempts):
+    base = getattr(settings, "SOFTDESK_JOB_RETRY_DELAY", DEFAULT_RETRY_DELAY)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def worker_name():
+    return "%s:%d" % (socket.gethostname(), os.getpid())
+
+
+def job_queryset():
+    # Jobs are polled right after being enqueued: never read a read replica
+    return Jobs.objects.using(DEFAULT_DB_ALIAS)
+
+
+def enqueue(kind, project_id, user=None, **payload):
+    handler = handlers[kind]
+    return Jobs.objects.create(
+        kind=kind,
+        project_id=project_id,
+        user_id=user,
+        payload=payload,
+        max_attempts=handler.max_attempts,
+    )
+
+
+def pending_job(kind, project_id):
+    """The queued or running job of kind on project_id, if any"""
+    return (
+        job_queryset()
+        .filter(
+            kind=kind, project_id=project_id, status__in=[Jobs.QUEUED, Jobs.RUNNING]
+        )
+        .order_by("id")
+        .first()
+    )
+
+
+def claim(worker=None):
+    """
+    Mark the oldest ready job as running for worker and return it, or None.
+
+    The UPDATE repeats the readiness condition, so that when two workers
+    pick the same job only one of them changes the row.
+    """
+    now = timezone.now()
+    ready = Q(status=Jobs.QUEUED, run_after__lte=now) | Q(
+        status=Jobs.RUNNING, started_time__lt=now - timedelta(seconds=get_lease())
+    )
+
+    for job_id in (
+        job_queryset().filter(ready).order_by("id").values_list("id", flat=True)[:10]
+    ):
+        claimed = (
+            job_queryset()
+            .filter(ready, id=job_id)
+            .update(
+                status=Jobs.RUNNING,
+                worker=worker or worker_name(),
+                started_time=now,
+                attempts=F("attempts") + 1,
+            )
+        )
+        if claimed:
+            return job_queryset().get(id=job_id)
+    return None
+
+
+def finish(job, **fields):
+    """
+    Record the outcome of job's current attempt. Ignored when the job was
+    claimed again meanwhile (lease expired), the new attempt owning it.
+    """
+    return (
+        job_queryset()
+        .filter(id=job.id, status=Jobs.RUNNING, attempts=job.attempts)
+        .update(**fields)
+    )
+
+
+def failed(job, handler):
+    if handler is None or handler.on_failure is None:
+        return
+    try:
+        handler.on_failure(job)
+    except Exception:
+        logger.exception("job %d (%s) failure handler failed", job.id, job.kind)
+
+
+def run(job_id):
+    """Run the claimed job job_id and record its outcome; returns its status"""
+    job = job_queryset().get(id=job_id)
+    handler = handlers.get(job.kind)
+
+    try:
+        if handler is None:
+            raise PermanentJobError("Type de tâche inconnu : %s" % job.kind)
+        if job.attempts > job.max_attempts:
+            raise PermanentJobError("Abandonnée après %d essais." % job.max_attempts)
+        result = handler(job)
+    except PermanentJobError as e:
+        logger.warning("job %d (%s) failed: %s", job.id, job.kind, e)
+        if finish(
+            job,
+            status=Jobs.FAILED,
+            result=e.result,
+            error=str(e),
+            finished_time=timezone.now(),
+        ):
+            failed(job, handler)
+        return Jobs.FAILED
+    except Exception as e:
+        logger.exception(
+            "job %d (%s) attempt %d failed", job.id, job.kind, job.attempts
+        )
+        if job.attempts < job.max_attempts:
+            status = Jobs.QUEUED
+            finish(
+                job,
+                status=status,
+                error=str(e) or repr(e),
+                run_after=timezone.now() + get_retry_delay(job.attempts),
+            )
+        else:
+            status = Jobs.FAILED
+            if finish(
+                job,
+                status=status,
+                error=str(e) or repr(e),
+                finished_time=timezone.now(),
+            ):
+                failed(job, handler)
+        return status
+
+    finish(
+        job,
+        status=Jobs.SUCCEEDED,
+        result=result,
+        error="",
+        finished_time=timezone.now(),
+    )
+    return Jobs.SUCCEEDED
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from myapp.changes import compact_changes
+
+
+class Command(BaseCommand):
+
+    help = "Compact the project change logs (run it periodically, e.g. daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Keep this many days of entries "
+            "(default: SOFTDESK_CHANGE_LOG_RETENTION_DAYS)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        retention = None
+        if options["days"] is not None:
+            retention = timedelta(days=options["days"])
+        superseded, expired = compact_changes(retention)
+
+        self.stdout.write("superseded entries removed: %d" % superseded)
+        self.stdout.write("expired entries removed: %d" % expired)
+        self.stdout.write(self.style.SUCCESS("All Done !"))
@@ -0,0 +1,183 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from myapp.access import project_access_queryset
+from myapp.models import Projects, Issues, Comments
+from myapp.project_cache import (
+    cached_reader,
+    counters_queryset,
+    projects_queryset,
+    visible_projects,
+)
+from myapp.queries import (
+    project_queryset,
+    contributors_queryset,
+    contributor_queryset,
+    issues_queryset,
+    issue_queryset,
+    issue_version_queryset,
+    comments_queryset,
+    comment_queryset,
+    comment_version_queryset,
+)
+from myapp.serializers import values_reader
+from myapp.versioning import project_version_queryset
+from myapp.views import (
+    ProjectView,
+    DetailProjectView,
+    ContributorsView,
+    ProjectIssueView,
+    IssueCommentView,
+    CommentView,
+)
+
+
+class Command(BaseCommand):
+
+    help = "Print the query plan of the queries issued by the API views"
+
+    factory = RequestFactory()
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, help="Project id (default: first)")
+        parser.add_argument("--user", type=int, help="User id (default: author)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        if options["project"] is not None:
+            project = Projects.objects.filter(id=options["project"]).first()
+        else:
+            project = Projects.objects.order_by("id").first()
+        if project is None:
+            raise CommandError("Aucun projet à analyser.")
+
+        user_id = options["user"] or project.author_user_id_id
+        issue = Issues.objects.filter(project_id=project).order_by("id").first()
+        issue_id = issue.id if issue is not None else 0
+        comment = Comments.objects.filter(issue_id=issue_id).order_by("id").first()
+        comment_id = comment.id if comment is not None else 0
+
+        for label, queryset in self.get_queries(
+            project, user_id, issue, issue_id, comment_id
+        ):
+            self.stdout.write(self.style.SQL_TABLE(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
+
+        self.stdout.write(self.style.SUCCESS("All Done !"))
+
+    def page_queryset(self, view_class, queryset, params=None, position=None):
+        """
+        The query of a page of queryset, filtered, ordered and paginated as
+        view_class does for a GET with params, from position when given
+        """
+        request = Request(self.factory.get("/", params or {}))
+        paginator = view_class.pagination_class()
+        issue_filter = getattr(view_class, "issue_filter", None)
+        if issue_filter is not None:
+            queryset = issue_filter.filter_queryset(request, queryset)
+            paginator.ordering = issue_filter.get_ordering(request)
+
+        columns = values_reader(view_class.serializer_class).columns
+        return paginator.seek_queryset(
+            paginator.values_queryset(queryset, columns), position
+        )
+
+    def get_queries(self, project, user_id, issue, issue_id, comment_id):
+        # ProjectView reads the user's project ids, then their rows, both
+        # cached, then the counters of the page
+        project_ids = sorted(visible_projects(user_id).values_list("id", flat=True))
+        page_size = ProjectView.pagination_class.page_size
+        page_rows = [{"id": project_id} for project_id in project_ids[:page_size]]
+        # The keyset filter needs a real position, even without any issue
+        issue_position = (
+            [issue.created_time, issue.id] if issue is not None else [timezone.now(), 0]
+        )
+
+        return [
+            (
+                "access check (all project-scoped views)",
+                project_access_queryset(project.id, user_id),
+            ),
+            ("ETag (project version)", project_version_queryset(project.id)),
+            (
+                "ProjectView.get (project ids, cached)",
+                visible_projects(user_id).values_list("id", flat=True),
+            ),
+            (
+                "ProjectView.get (project rows, cached)",
+                projects_queryset(project_ids).values_list(
+                    *cached_reader(ProjectView.serializer_class).columns
+                ),
+            ),
+            ("ProjectView.get (counters)", counters_queryset(page_rows)),
+            (
+                "DetailProjectView.get",
+                project_queryset(
+                    project.id,
+                    values_reader(DetailProjectView.serializer_class).sources,
+                ),
+            ),
+            (
+                "ContributorsView.get",
+                self.page_queryset(ContributorsView, contributors_queryset(project.id)),
+            ),
+            (
+                "ContributorsView.post (duplicate check)",
+                contributor_queryset(project.id, user_id),
+            ),
+            (
+                "ProjectIssueView.get (first page)",
+                self.page_queryset(ProjectIssueView, issues_queryset(project.id)),
+            ),
+            (
+                "ProjectIssueView.get (next page)",
+                self.page_queryset(
+                    ProjectIssueView,
+                    issues_queryset(project.id),
+                    position=issue_position,
+                ),
+            ),
+            (
+                "ProjectIssueView.get (?assignee_user_id=&status=open)",
+                self.page_queryset(
+                    ProjectIssueView,
+                    issues_queryset(project.id),
+                    {"assignee_user_id": user_id, "status": "open"},
+                ),
+            ),
+            (
+                "ProjectIssueView.get (?priority=&ordering=-created_time)",
+                self.page_queryset(
+                    ProjectIssueView,
+                    issues_queryset(project.id),
+                    {"priority": "high", "ordering": "-created_time"},
+                ),
+            ),
+            ("IssueView", issue_queryset(project.id, issue_id)),
+            (
+                "IssueCommentView.get (issue check)",
+                issue_version_queryset(project.id, issue_id),
+            ),
+            (
+                "IssueCommentView.get",
+                self.page_queryset(IssueCommentView, comments_queryset(issue_id)),
+            ),
+            (
+                "CommentView.get (comment check)",
+                comment_version_queryset(project.id, issue_id, comment_id),
+            ),
+            (
+                "CommentView.get",
+                comment_queryset(
+                    project.id,
+                    issue_id,
+                    comment_id,
+                    values_reader(CommentView.serializer_class).sources,
+                ),
+            ),
+        ]
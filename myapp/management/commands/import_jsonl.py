@@ -0,0 +1,341 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from myapp.access import invalidate_project_access
+from myapp.counters import reconcile_counters
+from myapp.models import Projects, Contributors, Issues, Comments
+from myapp.project_cache import invalidate_user_projects
+from myapp.versioning import bump_projects_version
+
+UserModel = get_user_model()
+
+# Flushed in this order so that every foreign key points to an inserted row
+RECORD_TYPES = ["user", "project", "contributor", "issue", "comment"]
+
+# Projects per query when refreshing the caches after the import
+CHUNK_SIZE = 500
+
+
+class IdMap:
+    """
+    Old id -> new id mapping kept in a temporary SQLite file, so that memory
+    does not grow with the number of imported rows.
+    """
+
+    def __init__(self):
+        handle, self.path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            "CREATE TABLE id_map (kind TEXT, old INTEGER, new INTEGER, "
+            "PRIMARY KEY (kind, old)) WITHOUT ROWID"
+        )
+
+    def add_many(self, kind, pairs):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO id_map VALUES (?, ?, ?)",
+            [(kind, old, new) for old, new in pairs],
+        )
+
+    def get_many(self, kind, old_ids):
+        old_ids = list(set(old_ids))
+        mapping = {}
+        for start in range(0, len(old_ids), 500):
+            chunk = old_ids[start : start + 500]
+            rows = self.db.execute(
+                "SELECT old, new FROM id_map WHERE kind = ? AND old IN (%s)"
+                % ",".join("?" * len(chunk)),
+                [kind] + chunk,
+            )
+            mapping.update(rows)
+        return mapping
+
+    def close(self):
+        self.db.close()
+        os.remove(self.path)
+
+
+def created_time(data):
+    value = data.get("created_time")
+    return parse_datetime(value) if value else timezone.now()
+
+
+@contextmanager
+def keep_created_time(*models):
+    """Let bulk_create store the dumped created_time instead of now()"""
+    fields = [model._meta.get_field("created_time") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+
+    help = "Import users, projects, contributors, issues and comments from a JSONL dump"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help='JSONL file, one {"type", "data"} per line ("-" for stdin)'
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows buffered before being inserted in one transaction",
+        )
+        parser.add_argument(
+            "--keep-user-ids",
+            action="store_true",
+            help="Keep the user ids missing from the dump as they are, for a "
+            "dump of this database's own projects",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        self.batch_size = options["batch_size"]
+        self.keep_user_ids = options["keep_user_ids"]
+        if self.batch_size < 1:
+            raise CommandError("--batch-size doit être positif.")
+
+        self.buffers = {record_type: [] for record_type in RECORD_TYPES}
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+        self.touched_projects = set()
+        self.id_map = IdMap()
+
+        try:
+            with keep_created_time(Issues, Comments):
+                self.read(options["path"])
+                self.flush()
+        finally:
+            self.id_map.close()
+
+        self.refresh_caches(sorted(self.touched_projects))
+
+        for record_type in RECORD_TYPES:
+            self.stdout.write("%s: %d" % (record_type, self.counts[record_type]))
+        self.stdout.write(self.style.SUCCESS("All Done !"))
+
+    def refresh_caches(self, project_ids):
+        """Counters, versions and cached lists of the imported projects"""
+        reconcile_counters(project_ids, CHUNK_SIZE)
+        bump_projects_version(project_ids, CHUNK_SIZE)
+
+        for start in range(0, len(project_ids), CHUNK_SIZE):
+            chunk = project_ids[start : start + CHUNK_SIZE]
+            user_ids = set(
+                Projects.objects.filter(id__in=chunk).values_list(
+                    "author_user_id", flat=True
+                )
+            )
+            user_ids.update(
+                Contributors.objects.filter(project_id__in=chunk).values_list(
+                    "user_id", flat=True
+                )
+            )
+            invalidate_user_projects(*user_ids)
+            for project_id in chunk:
+                invalidate_project_access(project_id)
+
+    def read(self, path):
+        dump = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for line_number, line in enumerate(dump, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    record_type = record["type"]
+                    data = record["data"]
+                except (ValueError, KeyError, TypeError):
+                    raise CommandError(
+                        "Ligne %d : enregistrement invalide." % line_number
+                    )
+                if record_type not in self.buffers:
+                    raise CommandError(
+                        "Ligne %d : type inconnu %r." % (line_number, record_type)
+                    )
+
+                self.buffers[record_type].append((line_number, data))
+                if len(self.buffers[record_type]) >= self.batch_size:
+                    self.flush()
+        finally:
+            if dump is not sys.stdin:
+                dump.close()
+
+    def flush(self):
+        """Insert every buffered row, parents first, in one transaction"""
+        line_numbers = [
+            line_number
+            for records in self.buffers.values()
+            for line_number, _ in records[:1] + records[-1:]
+        ]
+        if not line_numbers:
+            return
+
+        try:
+            with transaction.atomic():
+                for record_type in RECORD_TYPES:
+                    records = self.buffers[record_type]
+                    if records:
+                        getattr(self, "insert_%ss" % record_type)(records)
+        except (KeyError, TypeError, ValueError, IntegrityError) as e:
+            raise CommandError(
+                "Lignes %d à %d : %r" % (min(line_numbers), max(line_numbers), e)
+            )
+
+        for record_type in RECORD_TYPES:
+            self.counts[record_type] += len(self.buffers[record_type])
+            self.buffers[record_type] = []
+
+    def users(self, records, *fields):
+        """
+        Map the old user ids found in fields; with --keep-user-ids the ids
+        missing from the dump are kept as is
+        """
+        if not self.keep_user_ids:
+            return self.parents("user", records, *fields)
+
+        old_ids = [data[field] for _, data in records for field in fields]
+        mapping = self.id_map.get_many("user", old_ids)
+        return lambda old_id: mapping.get(old_id, old_id)
+
+    def parents(self, kind, records, *fields):
+        old_ids = [data[field] for _, data in records for field in fields]
+        mapping = self.id_map.get_many(kind, old_ids)
+
+        def new_id(old_id):
+            try:
+                return mapping[old_id]
+            except KeyError:
+                raise ValueError("%s %r absent du fichier" % (kind, old_id))
+
+        return new_id
+
+    def insert_users(self, records):
+        emails = [
+            UserModel.objects.normalize_email(data["email"]) for _, data in records
+        ]
+        existing = dict(
+            UserModel.objects.filter(email__in=emails).values_list("email", "id")
+        )
+
+        pairs = []
+        new_users = {}
+        for (_, data), email in zip(records, emails):
+            if email in existing:
+                pairs.append((data["id"], existing[email]))
+            elif email in new_users:
+                new_users[email][1].append(data["id"])
+            else:
+                user = UserModel(
+                    email=email,
+                    first_name=data.get("first_name", ""),
+                    last_name=data.get("last_name", ""),
+                    password=data.get("password") or "",
+                )
+                if not user.password:
+                    user.set_unusable_password()
+                new_users[email] = (user, [data["id"]])
+
+        UserModel.objects.bulk_create([user for user, _ in new_users.values()])
+        for user, old_ids in new_users.values():
+            pairs += [(old_id, user.id) for old_id in old_ids]
+        self.id_map.add_many("user", pairs)
+
+    def insert_projects(self, records):
+        user = self.users(records, "author_user_id")
+        projects = Projects.objects.bulk_create(
+            [
+                Projects(
+                    title=data["title"],
+                    description=data["description"],
+                    type=data["type"],
+                    author_user_id_id=user(data["author_user_id"]),
+                )
+                for _, data in records
+            ]
+        )
+        self.id_map.add_many(
+            "project",
+            [(data["id"], project.id) for (_, data), project in zip(records, projects)],
+        )
+        self.touched_projects.update(project.id for project in projects)
+
+    def insert_contributors(self, records):
+        user = self.users(records, "user_id")
+        project = self.parents("project", records, "project_id")
+        contributors = Contributors.objects.bulk_create(
+            [
+                Contributors(
+                    user_id_id=user(data["user_id"]),
+                    project_id_id=project(data["project_id"]),
+                    permission=data["permission"],
+                    role=data["role"],
+                )
+                for _, data in records
+            ],
+            ignore_conflicts=True,
+        )
+        self.touched_projects.update(
+            contributor.project_id_id for contributor in contributors
+        )
+
+    def insert_issues(self, records):
+        user = self.users(records, "author_user_id", "assignee_user_id")
+        project = self.parents("project", records, "project_id")
+        issues = Issues.objects.bulk_create(
+            [
+                Issues(
+                    title=data["title"],
+                    description=data["description"],
+                    tag=data["tag"],
+                    priority=data["priority"],
+                    status=data["status"],
+                    project_id_id=project(data["project_id"]),
+                    author_user_id_id=user(data["author_user_id"]),
+                    assignee_user_id_id=user(data["assignee_user_id"]),
+                    created_time=created_time(data),
+                )
+                for _, data in records
+            ]
+        )
+        self.id_map.add_many(
+            "issue",
+            [(data["id"], issue.id) for (_, data), issue in zip(records, issues)],
+        )
+        self.touched_projects.update(issue.project_id_id for issue in issues)
+
+    def insert_comments(self, records):
+        user = self.users(records, "author_user_id")
+        issue = self.parents("issue", records, "issue_id")
+        comments = Comments.objects.bulk_create(
+            [
+                Comments(
+                    description=data["description"],
+                    author_user_id_id=user(data["author_user_id"]),
+                    issue_id_id=issue(data["issue_id"]),
+                    created_time=created_time(data),
+                )
+                for _, data in records
+            ]
+        )
+        self.touched_projects.update(
+            Issues.objects.filter(id__in={comment.issue_id_id for comment in comments})
+            .values_list("project_id", flat=True)
+            .distinct()
+        )
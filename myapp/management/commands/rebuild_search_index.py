@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myapp.search import rebuild_index
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild the full-text search index of the issues and comments"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        if connection.vendor != "sqlite":
+            raise CommandError("La recherche plein texte nécessite SQLite (FTS5).")
+
+        rebuild_index()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM myapp_search")
+            (count,) = cursor.fetchone()
+        self.stdout.write("indexed: %d" % count)
+        self.stdout.write(self.style.SUCCESS("All Done !"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from myapp.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+
+    help = "Recompute the issue and comment counters that drifted from the rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            type=int,
+            action="append",
+            dest="projects",
+            help="Only this project (repeatable, default: every project)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        projects, issues = reconcile_counters(options["projects"])
+
+        self.stdout.write("projects fixed: %d" % projects)
+        self.stdout.write("issues fixed: %d" % issues)
+        self.stdout.write(self.style.SUCCESS("All Done !"))
@@ -0,0 +1,35 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from myapp.routers import get_replicas
+
+
+class Command(BaseCommand):
+
+    help = "Copy the primary SQLite database into every read replica file"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError("No read replica configured (SOFTDESK_READ_REPLICAS)")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            name = connections[alias].settings_dict["NAME"]
+
+            # Online backup: consistent copy while the primary keeps serving
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+
+            self.stdout.write("%s: %s" % (alias, name))
+
+        self.stdout.write(self.style.SUCCESS("All Done !"))
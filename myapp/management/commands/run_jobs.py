@@ -0,0 +1,135 @@
+import multiprocessing
+import signal
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.job_worker import init_process, run_job
+from myapp.jobs import claim, run, worker_name
+
+DEFAULT_PROCESSES = 2
+
+
+class Command(BaseCommand):
+
+    help = "Run the queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "SOFTDESK_JOB_PROCESSES", DEFAULT_PROCESSES),
+            help="Size of the process pool (0: run the jobs in this process)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between two looks at an empty queue",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no job is ready instead of waiting for new ones",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(self.help))
+
+        if options["processes"] < 0:
+            raise CommandError("--processes doit être positif ou nul.")
+
+        self.worker = worker_name()
+        self.poll_interval = options["poll_interval"]
+        self.once = options["once"]
+        self.stopping = False
+        self.counts = Counter()
+        signal.signal(signal.SIGTERM, self.stop)
+
+        try:
+            if options["processes"] == 0:
+                self.run_inline()
+            else:
+                self.run_pool(options["processes"])
+        except KeyboardInterrupt:
+            pass
+
+        for status, count in sorted(self.counts.items()):
+            self.stdout.write("%s: %d" % (status, count))
+        self.stdout.write(self.style.SUCCESS("All Done !"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run_inline(self):
+        while not self.stopping:
+            job = claim(self.worker)
+            if job is None:
+                if self.once:
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            self.counts[run(job.id)] += 1
+
+    def run_pool(self, processes):
+        """
+        Claim jobs here, as long as a process of the pool is free, and run
+        them there. Spawned processes do not inherit this process' database
+        connection.
+        """
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(processes, context, initializer=init_process)
+        running = {}
+        try:
+            while not self.stopping:
+                done = [future for future in running if future.done()]
+                broken = [
+                    future
+                    for future in done
+                    if not self.collect(future, running.pop(future))
+                ]
+                if broken:
+                    pool.shutdown(wait=True)
+                    pool = ProcessPoolExecutor(
+                        processes, context, initializer=init_process
+                    )
+
+                claimed = False
+                while len(running) < processes and not self.stopping:
+                    job = claim(self.worker)
+                    if job is None:
+                        break
+                    claimed = True
+                    running[pool.submit(run_job, job.id)] = job
+
+                if running:
+                    wait(
+                        running, timeout=self.poll_interval, return_when=FIRST_COMPLETED
+                    )
+                elif self.once and not claimed:
+                    return
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            # Let the jobs at hand finish, new ones stay queued
+            pool.shutdown(wait=True)
+            for future, job in running.items():
+                self.collect(future, job)
+
+    def collect(self, future, job):
+        """Count the outcome of job; False when its process died"""
+        try:
+            self.counts[future.result()] += 1
+        except BrokenProcessPool:
+            # Still marked running: claimed again once its lease expires
+            self.stderr.write("job %d : processus interrompu." % job.id)
+            self.counts["interrupted"] += 1
+            return False
+        except Exception as e:
+            self.stderr.write("job %d : %r" % (job.id, e))
+            self.counts["error"] += 1
+        return True
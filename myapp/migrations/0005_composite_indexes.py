@@ -0,0 +1,60 @@
+# Generated by Django 4.1.1 on 2026-10-18 03:35
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_contributors(apps, schema_editor):
+    Contributors = apps.get_model("myapp", "Contributors")
+    db_alias = schema_editor.connection.alias
+
+    kept_ids = (
+        Contributors.objects.using(db_alias)
+        .values("project_id", "user_id")
+        .annotate(kept_id=Min("id"))
+        .values_list("kept_id", flat=True)
+    )
+    Contributors.objects.using(db_alias).exclude(id__in=list(kept_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0004_alter_contributors_permission"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comments",
+            index=models.Index(
+                fields=["issue_id", "created_time"], name="comments_issue_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["project_id", "created_time"], name="issues_project_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["id", "project_id"], name="issues_id_project_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["assignee_user_id", "status"], name="issues_assignee_status_idx"
+            ),
+        ),
+        migrations.RunPython(
+            remove_duplicate_contributors, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="contributors",
+            constraint=models.UniqueConstraint(
+                fields=("project_id", "user_id"), name="unique_project_contributor"
+            ),
+        ),
+    ]
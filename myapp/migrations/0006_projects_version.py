@@ -0,0 +1,18 @@
+# Generated by Django 4.1.1 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0005_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="projects",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,108 @@
+from django.db import migrations
+
+# Issue rows are stored under rowid = 2 * id and comment rows under
+# rowid = 2 * id + 1, so that triggers reach an entry by its rowid.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE myapp_search USING fts5(
+        project_id UNINDEXED,
+        issue_id UNINDEXED,
+        title,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER myapp_search_issues_ai AFTER INSERT ON myapp_issues BEGIN
+        INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+        VALUES (2 * new.id, new.project_id_id, new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_search_issues_ad AFTER DELETE ON myapp_issues BEGIN
+        DELETE FROM myapp_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_search_issues_au
+    AFTER UPDATE OF title, description, project_id_id ON myapp_issues BEGIN
+        UPDATE myapp_search
+        SET project_id = new.project_id_id, title = new.title, body = new.description
+        WHERE rowid = 2 * old.id;
+        UPDATE myapp_search SET project_id = new.project_id_id
+        WHERE old.project_id_id != new.project_id_id
+        AND rowid IN (
+            SELECT 2 * id + 1 FROM myapp_comments WHERE issue_id_id = new.id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_search_comments_ai AFTER INSERT ON myapp_comments BEGIN
+        INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+        VALUES (
+            2 * new.id + 1,
+            (SELECT project_id_id FROM myapp_issues WHERE id = new.issue_id_id),
+            new.issue_id_id,
+            '',
+            new.description
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_search_comments_ad AFTER DELETE ON myapp_comments BEGIN
+        DELETE FROM myapp_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_search_comments_au
+    AFTER UPDATE OF description, issue_id_id ON myapp_comments BEGIN
+        UPDATE myapp_search
+        SET project_id = (
+                SELECT project_id_id FROM myapp_issues WHERE id = new.issue_id_id
+            ),
+            issue_id = new.issue_id_id,
+            body = new.description
+        WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    """
+    INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+    SELECT 2 * id, project_id_id, id, title, description FROM myapp_issues
+    """,
+    """
+    INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+    SELECT 2 * c.id + 1, i.project_id_id, c.issue_id_id, '', c.description
+    FROM myapp_comments c INNER JOIN myapp_issues i ON i.id = c.issue_id_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS myapp_search_comments_au",
+    "DROP TRIGGER IF EXISTS myapp_search_comments_ad",
+    "DROP TRIGGER IF EXISTS myapp_search_comments_ai",
+    "DROP TRIGGER IF EXISTS myapp_search_issues_au",
+    "DROP TRIGGER IF EXISTS myapp_search_issues_ad",
+    "DROP TRIGGER IF EXISTS myapp_search_issues_ai",
+    "DROP TABLE IF EXISTS myapp_search",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0006_projects_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.1 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0007_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["project_id", "assignee_user_id", "status", "created_time"],
+                name="issues_project_assignee_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["project_id", "status", "created_time"],
+                name="issues_project_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["project_id", "priority", "created_time"],
+                name="issues_project_priority_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issues",
+            index=models.Index(
+                fields=["project_id", "tag", "created_time"],
+                name="issues_project_tag_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.1.1 on 2026-10-18 03:50
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# SQLite rebuilds myapp_issues to add a column, which would drop the search
+# triggers created by 0007: they are dropped first and created again after.
+search_index = import_module("myapp.migrations.0007_search_index")
+TRIGGER_SQL = [sql for sql in search_index.CREATE_SQL if "CREATE TRIGGER" in sql]
+DROP_TRIGGER_SQL = [sql for sql in search_index.DROP_SQL if "DROP TRIGGER" in sql]
+
+
+def count_subquery(queryset, group_by):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_by: OuterRef("pk")})
+            .order_by()
+            .values(group_by)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Projects = apps.get_model("myapp", "Projects")
+    Issues = apps.get_model("myapp", "Issues")
+    Comments = apps.get_model("myapp", "Comments")
+    db_alias = schema_editor.connection.alias
+    closed = getattr(settings, "SOFTDESK_CLOSED_ISSUE_STATUSES", ["Terminé"])
+
+    issues = Issues.objects.using(db_alias)
+    Projects.objects.using(db_alias).update(
+        issue_count=count_subquery(issues.all(), "project_id"),
+        open_issue_count=count_subquery(
+            issues.exclude(status__in=closed), "project_id"
+        ),
+    )
+    issues.update(
+        comment_count=count_subquery(Comments.objects.using(db_alias), "issue_id")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0008_issue_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.run_on_sqlite(DROP_TRIGGER_SQL),
+            search_index.run_on_sqlite(TRIGGER_SQL),
+        ),
+        migrations.AddField(
+            model_name="issues",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="projects",
+            name="issue_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="projects",
+            name="open_issue_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            search_index.run_on_sqlite(TRIGGER_SQL),
+            search_index.run_on_sqlite(DROP_TRIGGER_SQL),
+        ),
+        migrations.RunPython(backfill_counters, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.1.1 on 2026-10-18 04:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("myapp", "0009_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Jobs",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=64, verbose_name="type")),
+                ("project_id", models.BigIntegerField(verbose_name="projet")),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "en attente"),
+                            ("running", "en cours"),
+                            ("succeeded", "terminée"),
+                            ("failed", "en échec"),
+                        ],
+                        default="queued",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("max_attempts", models.PositiveIntegerField(default=3)),
+                ("result", models.JSONField(null=True)),
+                ("error", models.TextField(blank=True, default="")),
+                ("worker", models.CharField(blank=True, default="", max_length=128)),
+                ("created_time", models.DateTimeField(auto_now_add=True)),
+                ("run_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("started_time", models.DateTimeField(null=True)),
+                ("finished_time", models.DateTimeField(null=True)),
+                (
+                    "user_id",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="jobs",
+            index=models.Index(
+                fields=["status", "run_after"], name="jobs_status_run_after_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="jobs",
+            index=models.Index(fields=["project_id", "id"], name="jobs_project_idx"),
+        ),
+    ]
@@ -0,0 +1,222 @@
+# Generated by Django 4.1.1 on 2026-10-18 04:12
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module("myapp.migrations.0007_search_index")
+
+ISSUE_PROJECT = "(SELECT project_id_id FROM myapp_issues WHERE id = %s.issue_id_id)"
+
+
+def log_change(project, kind, object_id, deleted, condition="1"):
+    """
+    Statements of a trigger body appending one entry to the change log of
+    project: the project's change_seq is incremented, then read back as the
+    entry's seq. Nothing is logged while change_seq is NULL (deletion).
+    """
+    return """
+        UPDATE myapp_projects SET change_seq = change_seq + 1
+        WHERE id = {project} AND {condition};
+        INSERT INTO myapp_changes
+            (project_id, seq, kind, object_id, deleted, created_time)
+        SELECT id, change_seq, '{kind}', {object_id}, {deleted},
+            strftime('%Y-%m-%d %H:%M:%f', 'now')
+        FROM myapp_projects
+        WHERE id = {project} AND change_seq IS NOT NULL AND {condition};
+    """.format(
+        project=project,
+        kind=kind,
+        object_id=object_id,
+        deleted=int(deleted),
+        condition=condition,
+    )
+
+
+# Triggers, so that bulk_create, queryset updates and raw deletes are logged
+# too. Issue updates touching comment_count alone are not logged: comments
+# have their own entries. A later migration rebuilding one of these tables
+# has to drop and create these triggers again, see 0009_counters.
+CREATE_SQL = [
+    """
+    CREATE TRIGGER myapp_changes_issues_ai AFTER INSERT ON myapp_issues BEGIN
+    %s
+    END
+    """
+    % log_change("new.project_id_id", "issue", "new.id", False),
+    """
+    CREATE TRIGGER myapp_changes_issues_ad AFTER DELETE ON myapp_issues BEGIN
+    %s
+    END
+    """
+    % log_change("old.project_id_id", "issue", "old.id", True),
+    """
+    CREATE TRIGGER myapp_changes_issues_au
+    AFTER UPDATE OF title, description, tag, priority, project_id_id, status,
+        assignee_user_id_id
+    ON myapp_issues BEGIN
+    %s
+    %s
+    END
+    """
+    % (
+        log_change(
+            "old.project_id_id",
+            "issue",
+            "old.id",
+            True,
+            "old.project_id_id != new.project_id_id",
+        ),
+        log_change("new.project_id_id", "issue", "new.id", False),
+    ),
+    """
+    CREATE TRIGGER myapp_changes_comments_ai AFTER INSERT ON myapp_comments BEGIN
+    %s
+    END
+    """
+    % log_change(ISSUE_PROJECT % "new", "comment", "new.id", False),
+    """
+    CREATE TRIGGER myapp_changes_comments_ad AFTER DELETE ON myapp_comments BEGIN
+    %s
+    END
+    """
+    % log_change(ISSUE_PROJECT % "old", "comment", "old.id", True),
+    """
+    CREATE TRIGGER myapp_changes_comments_au
+    AFTER UPDATE OF description, issue_id_id ON myapp_comments BEGIN
+    %s
+    %s
+    END
+    """
+    % (
+        log_change(
+            ISSUE_PROJECT % "old",
+            "comment",
+            "old.id",
+            True,
+            "%s != %s" % (ISSUE_PROJECT % "old", ISSUE_PROJECT % "new"),
+        ),
+        log_change(ISSUE_PROJECT % "new", "comment", "new.id", False),
+    ),
+    """
+    CREATE TRIGGER myapp_changes_contributors_ai
+    AFTER INSERT ON myapp_contributors BEGIN
+    %s
+    END
+    """
+    % log_change("new.project_id_id", "contributor", "new.id", False),
+    """
+    CREATE TRIGGER myapp_changes_contributors_ad
+    AFTER DELETE ON myapp_contributors BEGIN
+    %s
+    END
+    """
+    % log_change("old.project_id_id", "contributor", "old.id", True),
+    """
+    CREATE TRIGGER myapp_changes_contributors_au
+    AFTER UPDATE OF user_id_id, project_id_id, permission, role
+    ON myapp_contributors BEGIN
+    %s
+    %s
+    END
+    """
+    % (
+        log_change(
+            "old.project_id_id",
+            "contributor",
+            "old.id",
+            True,
+            "old.project_id_id != new.project_id_id",
+        ),
+        log_change("new.project_id_id", "contributor", "new.id", False),
+    ),
+    """
+    CREATE TRIGGER myapp_changes_projects_ad AFTER DELETE ON myapp_projects BEGIN
+        DELETE FROM myapp_changes WHERE project_id = old.id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS myapp_changes_projects_ad",
+    "DROP TRIGGER IF EXISTS myapp_changes_contributors_au",
+    "DROP TRIGGER IF EXISTS myapp_changes_contributors_ad",
+    "DROP TRIGGER IF EXISTS myapp_changes_contributors_ai",
+    "DROP TRIGGER IF EXISTS myapp_changes_comments_au",
+    "DROP TRIGGER IF EXISTS myapp_changes_comments_ad",
+    "DROP TRIGGER IF EXISTS myapp_changes_comments_ai",
+    "DROP TRIGGER IF EXISTS myapp_changes_issues_au",
+    "DROP TRIGGER IF EXISTS myapp_changes_issues_ad",
+    "DROP TRIGGER IF EXISTS myapp_changes_issues_ai",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0010_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Changes",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("project_id", models.BigIntegerField(verbose_name="projet")),
+                ("seq", models.PositiveBigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("issue", "problème"),
+                            ("comment", "commentaire"),
+                            ("contributor", "contributeur"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("created_time", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="projects",
+            name="change_floor",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="projects",
+            name="change_seq",
+            field=models.PositiveBigIntegerField(default=0, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="changes",
+            index=models.Index(
+                fields=["project_id", "kind", "object_id", "seq"],
+                name="changes_object_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changes",
+            index=models.Index(fields=["created_time"], name="changes_created_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="changes",
+            constraint=models.UniqueConstraint(
+                fields=("project_id", "seq"), name="unique_project_change_seq"
+            ),
+        ),
+        migrations.RunPython(
+            search_index.run_on_sqlite(CREATE_SQL),
+            search_index.run_on_sqlite(DROP_SQL),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 4.1.1 on 2026-10-18 04:16
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+change_log = import_module("myapp.migrations.0011_change_log")
+search_index = import_module("myapp.migrations.0007_search_index")
+
+ISSUE_PROJECT = change_log.ISSUE_PROJECT
+
+
+def log_change(project, kind, object_id, deleted, created=False, condition="1"):
+    """log_change of 0011, with the created flag read by myapp.events"""
+    return """
+        UPDATE myapp_projects SET change_seq = change_seq + 1
+        WHERE id = {project} AND {condition};
+        INSERT INTO myapp_changes
+            (project_id, seq, kind, object_id, deleted, created, created_time)
+        SELECT id, change_seq, '{kind}', {object_id}, {deleted}, {created},
+            strftime('%Y-%m-%d %H:%M:%f', 'now')
+        FROM myapp_projects
+        WHERE id = {project} AND change_seq IS NOT NULL AND {condition};
+    """.format(
+        project=project,
+        kind=kind,
+        object_id=object_id,
+        deleted=int(deleted),
+        created=int(created),
+        condition=condition,
+    )
+
+
+def log_update(project, kind, columns, table):
+    """
+    Trigger body of an update: a deletion in the old project when the row
+    moved, then a change in the new one.
+    """
+    return """
+    AFTER UPDATE OF {columns} ON {table} BEGIN
+    {moved}
+    {changed}
+    END
+    """.format(
+        columns=columns,
+        table=table,
+        moved=log_change(
+            project % "old",
+            kind,
+            "old.id",
+            True,
+            condition="%s != %s" % (project % "old", project % "new"),
+        ),
+        changed=log_change(project % "new", kind, "new.id", False),
+    )
+
+
+# SQLite rebuilds myapp_changes to add a column, which fails while the
+# triggers of 0011 refer to it, and their inserts would miss the new
+# column: they are dropped first and created again after.
+CREATE_SQL = [
+    """
+    CREATE TRIGGER myapp_changes_issues_ai AFTER INSERT ON myapp_issues BEGIN
+    %s
+    END
+    """
+    % log_change("new.project_id_id", "issue", "new.id", False, created=True),
+    """
+    CREATE TRIGGER myapp_changes_issues_ad AFTER DELETE ON myapp_issues BEGIN
+    %s
+    END
+    """
+    % log_change("old.project_id_id", "issue", "old.id", True),
+    "CREATE TRIGGER myapp_changes_issues_au"
+    + log_update(
+        "%s.project_id_id",
+        "issue",
+        "title, description, tag, priority, project_id_id, status, "
+        "assignee_user_id_id",
+        "myapp_issues",
+    ),
+    """
+    CREATE TRIGGER myapp_changes_comments_ai AFTER INSERT ON myapp_comments BEGIN
+    %s
+    END
+    """
+    % log_change(ISSUE_PROJECT % "new", "comment", "new.id", False, created=True),
+    """
+    CREATE TRIGGER myapp_changes_comments_ad AFTER DELETE ON myapp_comments BEGIN
+    %s
+    END
+    """
+    % log_change(ISSUE_PROJECT % "old", "comment", "old.id", True),
+    "CREATE TRIGGER myapp_changes_comments_au"
+    + log_update(
+        ISSUE_PROJECT,
+        "comment",
+        "description, issue_id_id",
+        "myapp_comments",
+    ),
+    """
+    CREATE TRIGGER myapp_changes_contributors_ai
+    AFTER INSERT ON myapp_contributors BEGIN
+    %s
+    END
+    """
+    % log_change("new.project_id_id", "contributor", "new.id", False, created=True),
+    """
+    CREATE TRIGGER myapp_changes_contributors_ad
+    AFTER DELETE ON myapp_contributors BEGIN
+    %s
+    END
+    """
+    % log_change("old.project_id_id", "contributor", "old.id", True),
+    "CREATE TRIGGER myapp_changes_contributors_au"
+    + log_update(
+        "%s.project_id_id",
+        "contributor",
+        "user_id_id, project_id_id, permission, role",
+        "myapp_contributors",
+    ),
+    """
+    CREATE TRIGGER myapp_changes_projects_ad AFTER DELETE ON myapp_projects BEGIN
+        DELETE FROM myapp_changes WHERE project_id = old.id;
+    END
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0011_change_log"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.run_on_sqlite(change_log.DROP_SQL),
+            search_index.run_on_sqlite(change_log.CREATE_SQL),
+        ),
+        migrations.AddField(
+            model_name="changes",
+            name="created",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(
+            search_index.run_on_sqlite(CREATE_SQL),
+            search_index.run_on_sqlite(change_log.DROP_SQL),
+        ),
+    ]
@@ -1,14 +1,73 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
+from django.utils import timezone
 
 
-class Projects(models.Model):
+class MaintainedFieldsModel(models.Model):
+    """
+    Model whose maintained_fields are only changed by F() updates (version,
+    counters). Saving an existing row leaves them out of the UPDATE, so that
+    an instance read earlier, or from a read replica, does not write back
+    stale values.
+    """
+
+    maintained_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # Deferred fields are left out too, as Model.save does by default
+            skipped = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+                and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class CountedModel(models.Model):
+    """
+    Model whose post_save handlers (myapp.signals) update counters and the
+    project version: save() runs them in the transaction of the row write.
+    Deletions already send post_delete within theirs.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class Projects(MaintainedFieldsModel):
     title = models.CharField(max_length=128, verbose_name="titre")
     description = models.CharField(max_length=1000, verbose_name="description")
     type = models.CharField(max_length=128, verbose_name="type")
     author_user_id = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    issue_count = models.PositiveIntegerField(default=0, editable=False)
+    open_issue_count = models.PositiveIntegerField(default=0, editable=False)
+    # Last sequence number of the change log (Changes), NULL while the
+    # project is being deleted; entries up to change_floor were compacted
+    change_seq = models.PositiveBigIntegerField(default=0, null=True, editable=False)
+    change_floor = models.PositiveBigIntegerField(default=0, editable=False)
+
+    maintained_fields = (
+        "version",
+        "issue_count",
+        "open_issue_count",
+        "change_seq",
+        "change_floor",
+    )
 
 
 class Contributors(models.Model):
@@ -17,8 +76,15 @@ class Contributors(models.Model):
     permission = models.CharField(max_length=128, verbose_name="permission")
     role = models.CharField(max_length=128, verbose_name="rôle")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project_id", "user_id"], name="unique_project_contributor"
+            )
+        ]
 
-class Issues(models.Model):
+
+class Issues(CountedModel, MaintainedFieldsModel):
     title = models.CharField(max_length=128, verbose_name="titre")
     description = models.CharField(max_length=1000, verbose_name="description")
     tag = models.CharField(max_length=128, verbose_name="balise")
@@ -34,12 +100,130 @@ class Issues(models.Model):
         related_name="assignee_user_id",
     )
     created_time = models.DateTimeField(auto_now_add=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    maintained_fields = ("comment_count",)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project_id", "created_time"], name="issues_project_created_idx"
+            ),
+            models.Index(fields=["id", "project_id"], name="issues_id_project_idx"),
+            models.Index(
+                fields=["assignee_user_id", "status"], name="issues_assignee_status_idx"
+            ),
+            models.Index(
+                fields=["project_id", "assignee_user_id", "status", "created_time"],
+                name="issues_project_assignee_idx",
+            ),
+            models.Index(
+                fields=["project_id", "status", "created_time"],
+                name="issues_project_status_idx",
+            ),
+            models.Index(
+                fields=["project_id", "priority", "created_time"],
+                name="issues_project_priority_idx",
+            ),
+            models.Index(
+                fields=["project_id", "tag", "created_time"],
+                name="issues_project_tag_idx",
+            ),
+        ]
 
 
-class Comments(models.Model):
+class Comments(CountedModel):
     description = models.CharField(max_length=1000, verbose_name="description")
     author_user_id = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
     issue_id = models.ForeignKey(Issues, on_delete=models.CASCADE)
     created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["issue_id", "created_time"], name="comments_issue_created_idx"
+            ),
+        ]
+
+
+class Jobs(models.Model):
+    """Background job run by manage.py run_jobs, see myapp.jobs"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "en attente"),
+        (RUNNING, "en cours"),
+        (SUCCEEDED, "terminée"),
+        (FAILED, "en échec"),
+    ]
+
+    kind = models.CharField(max_length=64, verbose_name="type")
+    # Not a foreign key: the job of a project deletion outlives the project
+    project_id = models.BigIntegerField(verbose_name="projet")
+    user_id = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL
+    )
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=128, blank=True, default="")
+    created_time = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_time = models.DateTimeField(null=True)
+    finished_time = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="jobs_status_run_after_idx"
+            ),
+            models.Index(fields=["project_id", "id"], name="jobs_project_idx"),
+        ]
+
+
+class Changes(models.Model):
+    """
+    Entry of a project's change log, written by SQLite triggers in the
+    transaction of every issue, comment and contributor write, see
+    myapp.changes.
+    """
+
+    ISSUE = "issue"
+    COMMENT = "comment"
+    CONTRIBUTOR = "contributor"
+    KIND_CHOICES = [
+        (ISSUE, "problème"),
+        (COMMENT, "commentaire"),
+        (CONTRIBUTOR, "contributeur"),
+    ]
+
+    # Not a foreign key: entries are removed by a trigger on project deletion
+    project_id = models.BigIntegerField(verbose_name="projet")
+    seq = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.BooleanField(default=False)
+    created_time = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project_id", "seq"], name="unique_project_change_seq"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["project_id", "kind", "object_id", "seq"],
+                name="changes_object_idx",
+            ),
+            models.Index(fields=["created_time"], name="changes_created_idx"),
+        ]
@@ -0,0 +1,243 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from itertools import dropwhile, islice
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ordering (keyset / "seek" method).
+
+    The cursor carries the values of the ordering fields of the last row sent,
+    the next page is fetched with a WHERE clause on those values instead of an
+    OFFSET, so every page costs the same index range scan.
+    """
+
+    ordering = ("id",)
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Curseur de pagination invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self.get_page_queryset(queryset, request)
+        return self.get_page(list(queryset), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self.get_page_queryset(queryset, request)
+        return self.get_page([row async for row in queryset], position, reverse)
+
+    def get_page_queryset(self, queryset, request):
+        """The unevaluated queryset of the requested page, plus its cursor"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request)
+        return self.seek_queryset(queryset, position, reverse), position, reverse
+
+    def seek_queryset(self, queryset, position=None, reverse=False):
+        """The unevaluated page of queryset following position"""
+        ordering = self.get_ordering(reverse)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def paginate_values(self, queryset, columns, request, view=None):
+        """
+        Same as paginate_queryset, the page being values_list tuples of
+        columns. Ordering columns missing from columns are appended after them.
+        """
+        return self.paginate_queryset(
+            self.values_queryset(queryset, columns), request, view
+        )
+
+    async def apaginate_values(self, queryset, columns, request, view=None):
+        return await self.apaginate_queryset(
+            self.values_queryset(queryset, columns), request, view
+        )
+
+    def values_queryset(self, queryset, columns):
+        self.columns = list(columns)
+        for field in self.ordering:
+            attname = queryset.model._meta.get_field(field.lstrip("-")).attname
+            if attname not in self.columns:
+                self.columns.append(attname)
+
+        return queryset.values_list(*self.columns)
+
+    def paginate_list(self, rows, model, request, view=None):
+        """
+        Same as paginate_queryset over an in-memory list of serialized rows,
+        already sorted on the ordering fields, whose values are JSON types.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = model
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.get_ordering(reverse)
+        if reverse:
+            rows = reversed(rows)
+        if position is not None:
+            rows = dropwhile(
+                lambda row: not self.is_after(row, ordering, position), rows
+            )
+
+        return self.get_page(list(islice(rows, self.page_size + 1)), position, reverse)
+
+    def is_after(self, row, ordering, position):
+        for field, value in zip(ordering, position):
+            row_value = row[field.lstrip("-")]
+            if row_value != value:
+                return row_value < value if field.startswith("-") else row_value > value
+        return False
+
+    def get_page(self, rows, position, reverse):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = (position is not None) if reverse else has_more
+        self.has_previous = has_more if reverse else (position is not None)
+        self.first_position = self.get_position(rows[0]) if rows else None
+        self.last_position = self.get_position(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return list(self.ordering)
+        return [
+            field[1:] if field.startswith("-") else "-" + field
+            for field in self.ordering
+        ]
+
+    def seek_filter(self, ordering, position):
+        """
+        Build a >= x AND ((a > x) OR (a = x AND b > y) OR ...) for the given
+        ordering, the comparisons being reversed for descending fields. The
+        leading bound lets SQLite turn the OR into an index range scan.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{name + "__" + lookup: value})
+            equal[name] = value
+
+        if len(ordering) == 1:
+            return condition
+
+        first = ordering[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{first.lstrip("-") + "__" + bound: position[0]}) & condition
+
+    def get_position(self, row):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            if isinstance(row, dict):
+                value = row[name]
+            elif isinstance(row, tuple):
+                attname = self.model._meta.get_field(name).attname
+                value = row[self.columns.index(attname)]
+            else:
+                value = getattr(row, self.model._meta.get_field(name).attname)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse):
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ]
+        payload = json.dumps({"p": values, "r": int(reverse)}, separators=(",", ":"))
+        cursor = urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values = payload["p"]
+            reverse = bool(payload.get("r"))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = self.parse_position(values)
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def parse_position(self, values):
+        return [
+            self.model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(self.ordering, values)
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.last_position is None:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.first_position, reverse=True)
+
+
+class IdKeysetPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class CreatedTimeKeysetPagination(KeysetPagination):
+    ordering = ("created_time", "id")
+
+
+class RecentFirstKeysetPagination(KeysetPagination):
+    ordering = ("-id",)
@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from .models import Projects, Contributors
+from .serializers import values_reader
+
+DEFAULT_TIMEOUT = 300
+
+PROJECT_IDS_KEY = "softdesk:user:%s:project_ids"
+PROJECT_LIST_KEY = "softdesk:user:%s:projects"
+
+# Changed by every issue write: left out of the cached rows, read with the
+# page by add_counters
+COUNTER_FIELDS = ("issue_count", "open_issue_count")
+
+
+def get_timeout():
+    return getattr(settings, "SOFTDESK_PROJECT_LIST_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def visible_projects(user_id):
+    # Cached lists are filled from the primary, as the access cache is, so
+    # that a lagging replica cannot undo an invalidation
+    return Projects.objects.using(DEFAULT_DB_ALIAS).filter(
+        Q(author_user_id=user_id)
+        | Q(id__in=Contributors.objects.filter(user_id=user_id).values("project_id"))
+    )
+
+
+def visible_project_ids(user_id):
+    """Ids of the projects the user authored or contributes to"""
+    key = PROJECT_IDS_KEY % user_id
+    project_ids = cache.get(key)
+
+    if project_ids is None:
+        project_ids = frozenset(visible_projects(user_id).values_list("id", flat=True))
+        cache.set(key, project_ids, get_timeout())
+
+    return project_ids
+
+
+async def avisible_project_ids(user_id):
+    """Async visible_project_ids"""
+    key = PROJECT_IDS_KEY % user_id
+    project_ids = await cache.aget(key)
+
+    if project_ids is None:
+        project_ids = frozenset(
+            [
+                project_id
+                async for project_id in visible_projects(user_id).values_list(
+                    "id", flat=True
+                )
+            ]
+        )
+        await cache.aset(key, project_ids, get_timeout())
+
+    return project_ids
+
+
+def projects_queryset(project_ids):
+    return (
+        Projects.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id__in=project_ids)
+        .order_by("id")
+    )
+
+
+def cached_reader(serializer_class):
+    fields = frozenset(values_reader(serializer_class).names)
+    return values_reader(serializer_class, fields - set(COUNTER_FIELDS))
+
+
+def serialized_projects(user_id, serializer_class):
+    """
+    Serialized list of the user's projects, ordered by id, without their
+    counters (see add_counters)
+    """
+    key = PROJECT_LIST_KEY % user_id
+    rows = cache.get(key)
+
+    if rows is None:
+        projects = projects_queryset(visible_project_ids(user_id))
+        rows = cached_reader(serializer_class).read(projects)
+        cache.set(key, rows, get_timeout())
+
+    return rows
+
+
+async def aserialized_projects(user_id, serializer_class):
+    """Async serialized_projects"""
+    key = PROJECT_LIST_KEY % user_id
+    rows = await cache.aget(key)
+
+    if rows is None:
+        projects = projects_queryset(await avisible_project_ids(user_id))
+        rows = await cached_reader(serializer_class).aread(projects)
+        await cache.aset(key, rows, get_timeout())
+
+    return rows
+
+
+def counters_queryset(rows):
+    return Projects.objects.filter(id__in=[row["id"] for row in rows]).values_list(
+        "id", *COUNTER_FIELDS
+    )
+
+
+def merge_counters(rows, counters):
+    # A project deleted since the rows were cached has no counters: dropped
+    return [
+        dict(row, **dict(zip(COUNTER_FIELDS, counters[row["id"]])))
+        for row in rows
+        if row["id"] in counters
+    ]
+
+
+def add_counters(rows):
+    """
+    Rows of serialized_projects with their current counters, without the
+    projects deleted since they were cached
+    """
+    if not rows:
+        return rows
+    counters = {row[0]: row[1:] for row in counters_queryset(rows)}
+    return merge_counters(rows, counters)
+
+
+async def aadd_counters(rows):
+    """Async add_counters"""
+    if not rows:
+        return rows
+    counters = {row[0]: row[1:] async for row in counters_queryset(rows)}
+    return merge_counters(rows, counters)
+
+
+def invalidate_user_projects(*user_ids):
+    keys = []
+    for user_id in user_ids:
+        keys += [PROJECT_IDS_KEY % user_id, PROJECT_LIST_KEY % user_id]
+    cache.delete_many(keys)
+
+
+def invalidate_project_members(project_id, author_user_id):
+    """Drop the cached lists of everyone who sees the project"""
+    user_ids = set(
+        Contributors.objects.filter(project_id=project_id).values_list(
+            "user_id", flat=True
+        )
+    )
+    user_ids.add(author_user_id)
+    invalidate_user_projects(*user_ids)
@@ -0,0 +1,50 @@
+"""
+Querysets of the API views, shared with the explain_queries command so that
+the plans it prints are those of the queries the views run.
+"""
+from .models import Projects, Contributors, Issues, Comments
+
+
+def project_queryset(project_id, sources):
+    """The project, with the model fields in sources and its version"""
+    return Projects.objects.only("version", *sources).filter(id=project_id)
+
+
+def contributors_queryset(project_id):
+    return Contributors.objects.filter(project_id=project_id)
+
+
+def contributor_queryset(project_id, user_id):
+    return Contributors.objects.filter(project_id=project_id, user_id=user_id)
+
+
+def issues_queryset(project_id):
+    return Issues.objects.filter(project_id=project_id)
+
+
+def issue_queryset(project_id, issue_id):
+    return Issues.objects.filter(id=issue_id, project_id=project_id)
+
+
+def issue_version_queryset(project_id, issue_id):
+    """Version of the project of the issue, empty if either is missing"""
+    return issue_queryset(project_id, issue_id).values_list(
+        "project_id__version", flat=True
+    )
+
+
+def comments_queryset(issue_id):
+    return Comments.objects.filter(issue_id=issue_id)
+
+
+def comment_queryset(project_id, issue_id, comment_id, sources):
+    return Comments.objects.only(*sources).filter(
+        id=comment_id, issue_id=issue_id, issue_id__project_id=project_id
+    )
+
+
+def comment_version_queryset(project_id, issue_id, comment_id):
+    """Version of the project of the comment, empty if any of them is missing"""
+    return Comments.objects.filter(
+        id=comment_id, issue_id=issue_id, issue_id__project_id=project_id
+    ).values_list("issue_id__project_id__version", flat=True)
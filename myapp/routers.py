@@ -0,0 +1,95 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+_request_state = ContextVar("softdesk_database_state", default=None)
+
+
+class RequestDatabaseState:
+    """Whether the current request wrote to the primary"""
+
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+def get_replicas():
+    return getattr(settings, "SOFTDESK_READ_REPLICAS", ())
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of a request to a random SOFTDESK_READ_REPLICAS alias and
+    every write to the primary. Once a request has written, its following
+    reads go to the primary too, so that it reads its own writes.
+
+    Outside of a request (commands, shell, workers) everything goes to the
+    primary: there is no request boundary to scope the stickiness to.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replicas = get_replicas()
+        if state is None or state.wrote or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary, see refresh_replicas
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Scopes the stickiness of ReplicaRouter to one request. Not used when no
+    replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        # A mutable state rather than a flag in the ContextVar: a write made
+        # in a sync_to_async thread must be seen by the reads that follow
+        token = _request_state.set(RequestDatabaseState())
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_state.set(RequestDatabaseState())
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_state.reset(token)
@@ -0,0 +1,123 @@
+from django.db import connection, connections, router, transaction
+
+from .models import Issues
+from .pagination import KeysetPagination
+
+# bm25 weights of the myapp_search columns: project_id, issue_id, title, body
+RANK = "bm25(myapp_search, 0.0, 0.0, 2.0, 1.0)"
+SNIPPET = "snippet(myapp_search, -1, '[', ']', '…', 16)"
+
+REBUILD_SQL = [
+    "DELETE FROM myapp_search",
+    """
+    INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+    SELECT 2 * id, project_id_id, id, title, description FROM myapp_issues
+    """,
+    """
+    INSERT INTO myapp_search (rowid, project_id, issue_id, title, body)
+    SELECT 2 * c.id + 1, i.project_id_id, c.issue_id_id, '', c.description
+    FROM myapp_comments c INNER JOIN myapp_issues i ON i.id = c.issue_id_id
+    """,
+    "INSERT INTO myapp_search (myapp_search) VALUES ('optimize')",
+]
+
+
+def match_query(text):
+    """
+    FTS5 query matching every term of text, each term being quoted so that
+    the FTS5 syntax characters are searched literally. A trailing * keeps
+    the term a prefix search.
+    """
+    terms = []
+    for term in text.split():
+        prefix = "*" if term.endswith("*") else ""
+        term = term.rstrip("*")
+        if term:
+            terms.append('"%s"%s' % (term.replace('"', '""'), prefix))
+    return " ".join(terms)
+
+
+def search_project(project_id, match, limit, position=None, reverse=False):
+    """
+    Up to limit hits of match in the project, best first, as dicts ordered by
+    (score, rowid) and starting after position.
+
+    The page is ranked first, snippets being computed for its rows only.
+    """
+    params = [match, project_id]
+    seek = ""
+    if position is not None:
+        operator = "<" if reverse else ">"
+        seek = "WHERE score %s %%s OR (score = %%s AND rowid %s %%s)" % (
+            operator,
+            operator,
+        )
+        params += [position[0], position[0], position[1]]
+    direction = "DESC" if reverse else "ASC"
+
+    # Raw SQL is not routed: ask the router, as a queryset on Issues would.
+    # Both reads in one transaction see the same rows
+    using = router.db_for_read(Issues)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid, score FROM ("
+            "SELECT rowid, %s AS score FROM myapp_search "
+            "WHERE myapp_search MATCH %%s AND project_id = %%s"
+            ") %s ORDER BY score %s, rowid %s LIMIT %%s"
+            % (RANK, seek, direction, direction),
+            params + [limit],
+        )
+        ranked = cursor.fetchall()
+        if not ranked:
+            return []
+
+        cursor.execute(
+            "SELECT rowid, issue_id, title, %s FROM myapp_search "
+            "WHERE myapp_search MATCH %%s AND rowid IN (%s)"
+            % (SNIPPET, ", ".join(["%s"] * len(ranked))),
+            [match] + [rowid for rowid, _ in ranked],
+        )
+        details = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    hits = []
+    for rowid, score in ranked:
+        if rowid not in details:
+            continue
+        issue_id, title, snippet = details[rowid]
+        hits.append(
+            {
+                "rowid": rowid,
+                "score": score,
+                "type": "comment" if rowid % 2 else "issue",
+                "id": rowid // 2,
+                "issue_id": issue_id,
+                "title": title,
+                "snippet": snippet,
+            }
+        )
+    return hits
+
+
+def rebuild_index():
+    """Rebuild the search table from the issues and comments tables"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in REBUILD_SQL:
+            cursor.execute(statement)
+
+
+class SearchPagination(KeysetPagination):
+    """Keyset pagination of search_project hits on (score, rowid)"""
+
+    ordering = ("score", "rowid")
+
+    def paginate_search(self, project_id, match, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        rows = search_project(project_id, match, self.page_size + 1, position, reverse)
+        return self.get_page(rows, position, reverse)
+
+    def parse_position(self, values):
+        score, rowid = values
+        return [float(score), int(rowid)]
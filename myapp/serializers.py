@@ -1,30 +1,130 @@
-from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
-from .models import Projects, Contributors, Issues, Comments
+from functools import lru_cache
+from time import perf_counter
 
+from django.contrib.auth import get_user_model
+from django.db import models
+from rest_framework.serializers import (
+    CharField,
+    IntegerField,
+    ModelSerializer,
+    PrimaryKeyRelatedField,
+)
+from .instrumentation import (
+    InstrumentedSerializerMixin,
+    InstrumentedListSerializer,
+    current_metrics,
+)
+from .models import Projects, Contributors, Issues, Comments, Jobs
 
-class ProjectsSerializer(ModelSerializer):
+User = get_user_model()
+
+
+class SparseFieldsMixin:
+    """Accepts fields=[...] to only keep a subset of the declared fields"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PrefetchedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves the primary key from a dict of
+    instances stored in the serializer context under ``context_key`` when
+    there is one, instead of running one query per value.
+    """
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get(self.context_key)
+        if prefetched is None:
+            return super().to_internal_value(data)
+
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return prefetched[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class IssuesListSerializer(InstrumentedListSerializer):
+    """
+    Validates a list of issues with a single query for all the assignees and
+    inserts them with one bulk_create.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            assignee_ids = set()
+            for item in data:
+                try:
+                    assignee_ids.add(int(item["assignee_user_id"]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self._context["assignees"] = User.objects.in_bulk(assignee_ids)
+
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        return Issues.objects.bulk_create(
+            [Issues(**attrs) for attrs in validated_data], batch_size=500
+        )
+
+
+class ProjectsSerializer(
+    SparseFieldsMixin, InstrumentedSerializerMixin, ModelSerializer
+):
 
     author_user_id = PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Projects
-        fields = ["id", "title", "description", "type", "author_user_id"]
+        list_serializer_class = InstrumentedListSerializer
+        fields = [
+            "id",
+            "title",
+            "description",
+            "type",
+            "author_user_id",
+            "issue_count",
+            "open_issue_count",
+        ]
 
 
-class ContributorsSerializer(ModelSerializer):
+class ContributorsSerializer(
+    SparseFieldsMixin, InstrumentedSerializerMixin, ModelSerializer
+):
     project_id = PrimaryKeyRelatedField(read_only=True)
+    user_id = PrefetchedPrimaryKeyRelatedField(
+        context_key="users", queryset=User.objects.all()
+    )
 
     class Meta:
         model = Contributors
+        list_serializer_class = InstrumentedListSerializer
         fields = ["id", "user_id", "project_id", "permission", "role"]
 
 
-class IssuesSerializer(ModelSerializer):
+class IssuesSerializer(SparseFieldsMixin, InstrumentedSerializerMixin, ModelSerializer):
     author_user_id = PrimaryKeyRelatedField(read_only=True)
     project_id = PrimaryKeyRelatedField(read_only=True)
+    assignee_user_id = PrefetchedPrimaryKeyRelatedField(
+        context_key="assignees", queryset=User.objects.all()
+    )
 
     class Meta:
         model = Issues
+        list_serializer_class = IssuesListSerializer
         fields = [
             "id",
             "title",
@@ -36,13 +136,127 @@ class IssuesSerializer(ModelSerializer):
             "author_user_id",
             "assignee_user_id",
             "created_time",
+            "comment_count",
         ]
 
 
-class CommentsSerializer(ModelSerializer):
+class CommentsSerializer(
+    SparseFieldsMixin, InstrumentedSerializerMixin, ModelSerializer
+):
     author_user_id = PrimaryKeyRelatedField(read_only=True)
     issue_id = PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Comments
+        list_serializer_class = InstrumentedListSerializer
         fields = ["id", "description", "author_user_id", "issue_id", "created_time"]
+
+
+class JobsSerializer(InstrumentedSerializerMixin, ModelSerializer):
+    user_id = PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Jobs
+        list_serializer_class = InstrumentedListSerializer
+        # payload is left out: it holds whole issue lists for import_issues
+        fields = [
+            "id",
+            "kind",
+            "project_id",
+            "user_id",
+            "status",
+            "attempts",
+            "max_attempts",
+            "result",
+            "error",
+            "created_time",
+            "run_after",
+            "started_time",
+            "finished_time",
+        ]
+        read_only_fields = fields
+
+
+class ValuesReader:
+    """
+    Read-only fast path for ``serializer_class(queryset, many=True).data``.
+
+    Rows are fetched as values_list tuples of the underlying columns and
+    turned into dicts by a field mapping compiled once: columns whose
+    serializer field would return the database value unchanged (text, integer
+    and primary key related fields) are copied as is, the others go through
+    the serializer field's own to_representation, so the output is the same
+    as the ModelSerializer's.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+
+        self.names = []
+        self.sources = []
+        self.columns = []
+        self.converters = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+
+            model_field = model._meta.get_field(field.source)
+            self.names.append(name)
+            self.sources.append(model_field.name)
+            self.columns.append(model_field.attname)
+            self.converters.append(self.get_converter(field, model_field))
+
+        self.names = tuple(self.names)
+        self.sources = tuple(self.sources)
+        self.columns = tuple(self.columns)
+
+    @staticmethod
+    def get_converter(field, model_field):
+        if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, CharField) and isinstance(
+            model_field, (models.CharField, models.TextField)
+        ):
+            return None
+        if isinstance(field, IntegerField) and isinstance(
+            model_field, (models.AutoField, models.IntegerField)
+        ):
+            return None
+        return field.to_representation
+
+    def to_representation(self, rows):
+        """Dicts of the serialized fields for tuples of self.columns"""
+        metrics = current_metrics()
+        start = perf_counter()
+
+        names = self.names
+        converters = self.converters
+        if not any(converters):
+            data = [dict(zip(names, row)) for row in rows]
+        else:
+            data = []
+            for row in rows:
+                item = {}
+                for name, converter, value in zip(names, converters, row):
+                    if converter is not None and value is not None:
+                        value = converter(value)
+                    item[name] = value
+                data.append(item)
+
+        if metrics is not None:
+            metrics.serializer_time += perf_counter() - start
+        return data
+
+    def read(self, queryset):
+        return self.to_representation(queryset.values_list(*self.columns))
+
+    async def aread(self, queryset):
+        rows = [row async for row in queryset.values_list(*self.columns)]
+        return self.to_representation(rows)
+
+
+@lru_cache(maxsize=None)
+def values_reader(serializer_class, fields=None):
+    """Shared ValuesReader of a serializer, fields being None or a frozenset"""
+    return ValuesReader(serializer_class, fields)
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .access import invalidate_project_access
+from .counters import issue_state_changed, adjust_comment_count
+from .database import configure_connection
+from .events import hub
+from .instrumentation import install_query_recorder
+from .models import Projects, Contributors, Issues, Comments
+from .project_cache import invalidate_user_projects, invalidate_project_members
+from .versioning import bump_project_version, bump_issue_project_version
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    configure_connection(connection)
+    install_query_recorder(connection)
+
+
+@receiver(post_save, sender=Projects)
+@receiver(post_delete, sender=Projects)
+def project_changed(sender, instance, **kwargs):
+    invalidate_project_access(instance.pk)
+    if kwargs.get("created") is False:
+        bump_project_version(instance.pk)
+        invalidate_project_members(instance.pk, instance.author_user_id_id)
+    else:
+        invalidate_user_projects(instance.author_user_id_id)
+
+
+@receiver(post_save, sender=Contributors)
+@receiver(post_delete, sender=Contributors)
+def contributor_changed(sender, instance, **kwargs):
+    invalidate_project_access(instance.project_id_id)
+    invalidate_user_projects(instance.user_id_id)
+    bump_project_version(instance.project_id_id)
+
+
+def issue_state(instance):
+    # Read from __dict__ so that deferred fields are not loaded
+    state = (instance.__dict__.get("project_id_id"), instance.__dict__.get("status"))
+    return None if None in state else state
+
+
+@receiver(post_init, sender=Issues)
+def issue_loaded(sender, instance, **kwargs):
+    instance._counted_state = issue_state(instance)
+
+
+@receiver(post_save, sender=Issues)
+@receiver(post_delete, sender=Issues)
+def issue_changed(sender, instance, **kwargs):
+    bump_project_version(instance.project_id_id)
+    transaction.on_commit(hub.wake)
+
+    created = kwargs.get("created")
+    if created is None:
+        issue_state_changed(issue_state(instance), None)
+    elif created:
+        issue_state_changed(None, issue_state(instance))
+    elif instance._counted_state is not None:
+        issue_state_changed(instance._counted_state, issue_state(instance))
+    instance._counted_state = issue_state(instance)
+
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def comment_changed(sender, instance, **kwargs):
+    bump_issue_project_version(instance.issue_id_id)
+    transaction.on_commit(hub.wake)
+
+    created = kwargs.get("created")
+    if created is None:
+        adjust_comment_count(instance.issue_id_id, -1)
+    elif created:
+        adjust_comment_count(instance.issue_id_id, 1)
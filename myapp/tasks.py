@@ -0,0 +1,116 @@
+"""Handlers of the background jobs, see myapp.jobs"""
+import os
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+
+from .counters import count_new_issues, reconcile_counters
+from .deletion import delete_project, restore_project
+from .export import FORMATS, buffered
+from .jobs import PermanentJobError, job
+from .models import Projects
+from .serializers import IssuesSerializer
+from .versioning import bump_project_version
+
+
+def get_project(job):
+    project = Projects.objects.filter(id=job.project_id).first()
+    if project is None:
+        raise PermanentJobError("Projet non trouvé.")
+    return project
+
+
+def create_issues(data, project_id, author):
+    """
+    Create a list of issues at once, all of them or none. Returns the status
+    code and body of the response, for the view and the import_issues job.
+    """
+    serializer = IssuesSerializer(data=data, many=True)
+
+    if not serializer.is_valid():
+        if isinstance(serializer.errors, dict):
+            return status.HTTP_400_BAD_REQUEST, serializer.errors
+
+        response = {
+            "message": "Aucun problème créé : certains problèmes sont invalides.",
+            "results": [
+                {"index": index, "status": 400, "errors": errors}
+                for index, errors in enumerate(serializer.errors)
+                if errors
+            ],
+        }
+        return status.HTTP_400_BAD_REQUEST, response
+
+    with transaction.atomic():
+        issues = serializer.save(project_id_id=project_id, author_user_id=author)
+        count_new_issues(issues)
+        bump_project_version(project_id)
+
+    response = {
+        "message": "%d problème(s) créé(s) avec succès !" % len(serializer.data),
+        "results": [
+            {"index": index, "status": 201, "data": issue}
+            for index, issue in enumerate(serializer.data)
+        ],
+    }
+    return status.HTTP_201_CREATED, response
+
+
+def delete_project_failed(job):
+    restore_project(job.project_id)
+
+
+@job("delete_project", on_failure=delete_project_failed)
+def delete_project_job(job):
+    project = Projects.objects.filter(id=job.project_id).first()
+    if project is None:
+        # Deleted by an earlier attempt, or by someone else
+        return {"deleted": {}}
+    return {"deleted": delete_project(project)}
+
+
+@job("export_project")
+def export_project_job(job):
+    output = job.payload.get("output", "json")
+    if output not in FORMATS:
+        raise PermanentJobError("Format d'export inconnu : json ou ndjson.")
+    content_type, extension, iter_export = FORMATS[output]
+    project = get_project(job)
+
+    directory = settings.SOFTDESK_JOB_FILES_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = "project-%d-job-%d.%s" % (project.id, job.id, extension)
+    path = os.path.join(directory, name)
+
+    # Written aside then renamed, a download never sees a partial file
+    with open(path + ".tmp", "w", encoding="utf-8") as export:
+        for part in buffered(iter_export(project)):
+            export.write(part)
+    os.replace(path + ".tmp", path)
+
+    return {"file": name, "content_type": content_type, "size": os.path.getsize(path)}
+
+
+@job("import_issues", max_attempts=1)
+def import_issues_job(job):
+    if job.user_id_id is None:
+        raise PermanentJobError("Auteur supprimé.")
+    get_project(job)
+
+    status_code, response = create_issues(
+        job.payload["issues"], job.project_id, job.user_id
+    )
+    if status_code != status.HTTP_201_CREATED:
+        raise PermanentJobError(
+            response.get("message", "Aucun problème créé : problèmes invalides."),
+            result=response,
+        )
+    return {"created": len(response["results"])}
+
+
+@job("reconcile_counters")
+def reconcile_counters_job(job):
+    get_project(job)
+    projects, issues = reconcile_counters([job.project_id])
+    return {"projects_fixed": projects, "issues_fixed": issues}
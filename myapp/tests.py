@@ -1,3 +1,220 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.models import User
+from .access import GENERATION_KEY, access_cache
+from .counters import reconcile_counters
+from .models import Projects, Contributors, Issues, Comments, Changes
+
+
+class ProjectTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        access_cache.clear()
+        self.author = User.objects.create_user("auteur@test.fr", "A", "A", "pw")
+        self.project = self.create_project("Projet")
+
+    def create_project(self, title):
+        return Projects.objects.create(
+            title=title, description="d", type="back-end", author_user_id=self.author
+        )
+
+    def create_issue(self, project=None, status="Ouvert"):
+        return Issues.objects.create(
+            title="Problème",
+            description="d",
+            tag="BUG",
+            priority="LOW",
+            status=status,
+            project_id=project or self.project,
+            author_user_id=self.author,
+            assignee_user_id=self.author,
+        )
+
+    def create_comment(self, issue):
+        return Comments.objects.create(
+            description="c", issue_id=issue, author_user_id=self.author
+        )
+
+    def counters(self, project=None):
+        project = Projects.objects.get(id=(project or self.project).id)
+        return project.issue_count, project.open_issue_count
+
+
+class CountersTests(ProjectTestCase):
+    def test_create(self):
+        issue = self.create_issue()
+        self.create_issue(status="Terminé")
+        self.create_comment(issue)
+        self.create_comment(issue)
+
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(Issues.objects.get(id=issue.id).comment_count, 2)
+
+    def test_status_change(self):
+        issue = self.create_issue()
+
+        issue.status = "Terminé"
+        issue.save()
+        self.assertEqual(self.counters(), (1, 0))
+
+        issue.status = "En cours"
+        issue.save()
+        self.assertEqual(self.counters(), (1, 1))
+
+    def test_move(self):
+        other = self.create_project("Autre")
+        issue = self.create_issue()
+
+        issue.project_id = other
+        issue.status = "Terminé"
+        issue.save()
+
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.counters(other), (1, 0))
+
+    def test_delete(self):
+        issue = self.create_issue()
+        self.create_issue()
+        comment = self.create_comment(issue)
+
+        comment.delete()
+        self.assertEqual(Issues.objects.get(id=issue.id).comment_count, 0)
+
+        issue.delete()
+        self.assertEqual(self.counters(), (1, 1))
+
+    def test_reconcile_counters(self):
+        issue = self.create_issue()
+        self.create_comment(issue)
+        other = self.create_project("Autre")
+        Projects.objects.filter(id=self.project.id).update(
+            issue_count=5, open_issue_count=0
+        )
+        Issues.objects.filter(id=issue.id).update(comment_count=3)
+        version = Projects.objects.get(id=self.project.id).version
+
+        self.assertEqual(reconcile_counters(), (1, 1))
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertEqual(self.counters(other), (0, 0))
+        self.assertEqual(Issues.objects.get(id=issue.id).comment_count, 1)
+        self.assertGreater(Projects.objects.get(id=self.project.id).version, version)
+
+        self.assertEqual(reconcile_counters(), (0, 0))
+
+
+class ChangesTests(ProjectTestCase):
+    def changes(self, project=None):
+        return list(
+            Changes.objects.filter(project_id=(project or self.project).id)
+            .order_by("seq")
+            .values_list("seq", "kind", "object_id", "deleted", "created")
+        )
+
+    def test_issue_and_comment(self):
+        issue = self.create_issue()
+        comment = self.create_comment(issue)
+        comment_id = comment.id
+        issue.title = "Renommé"
+        issue.save()
+        comment.delete()
+
+        self.assertEqual(
+            self.changes(),
+            [
+                (1, Changes.ISSUE, issue.id, False, True),
+                (2, Changes.COMMENT, comment_id, False, True),
+                (3, Changes.ISSUE, issue.id, False, False),
+                (4, Changes.COMMENT, comment_id, True, False),
+            ],
+        )
+        self.assertEqual(Projects.objects.get(id=self.project.id).change_seq, 4)
+
+    def test_counter_updates_are_not_logged(self):
+        issue = self.create_issue()
+        Issues.objects.filter(id=issue.id).update(comment_count=7)
+
+        self.assertEqual(len(self.changes()), 1)
+
+    def test_move(self):
+        other = self.create_project("Autre")
+        issue = self.create_issue()
+
+        issue.project_id = other
+        issue.save()
+
+        self.assertEqual(
+            self.changes(),
+            [
+                (1, Changes.ISSUE, issue.id, False, True),
+                (2, Changes.ISSUE, issue.id, True, False),
+            ],
+        )
+        self.assertEqual(
+            self.changes(other), [(1, Changes.ISSUE, issue.id, False, False)]
+        )
+
+    def test_contributor(self):
+        user = User.objects.create_user("contributeur@test.fr", "C", "C", "pw")
+        contributor = Contributors.objects.create(
+            user_id=user, project_id=self.project, permission="p", role="r"
+        )
+        contributor_id = contributor.id
+        contributor.delete()
+
+        self.assertEqual(
+            self.changes(),
+            [
+                (1, Changes.CONTRIBUTOR, contributor_id, False, True),
+                (2, Changes.CONTRIBUTOR, contributor_id, True, False),
+            ],
+        )
+
+
+class CacheInvalidationTests(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("membre@test.fr", "M", "M", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_removed_contributor_loses_access(self):
+        contributor = Contributors.objects.create(
+            user_id=self.user, project_id=self.project, permission="p", role="r"
+        )
+        url = "/api/projects/%d" % self.project.id
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        contributor.delete()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_access_invalidated_by_another_process(self):
+        Contributors.objects.create(
+            user_id=self.user, project_id=self.project, permission="p", role="r"
+        )
+        url = "/api/projects/%d" % self.project.id
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Removed without signals, the generation replaced as its
+        # invalidate_project_access would
+        Contributors.objects.filter(project_id=self.project)._raw_delete("default")
+        cache.set(GENERATION_KEY % self.project.id, "autre", None)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_project_list(self):
+        self.assertEqual(self.client.get("/api/projects/").data["results"], [])
+
+        Contributors.objects.create(
+            user_id=self.user, project_id=self.project, permission="p", role="r"
+        )
+        self.create_issue()
+        results = self.client.get("/api/projects/").data["results"]
+        self.assertEqual([row["id"] for row in results], [self.project.id])
+        self.assertEqual(results[0]["issue_count"], 1)
+
+        # Deleted without signals: the cached list still has the project
+        for model in (Issues, Contributors, Projects):
+            lookup = "id" if model is Projects else "project_id"
+            model.objects.filter(**{lookup: self.project.id})._raw_delete("default")
+        self.assertEqual(self.client.get("/api/projects/").data["results"], [])
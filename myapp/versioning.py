@@ -0,0 +1,59 @@
+from hashlib import sha1
+
+from django.db.models import F
+from django.utils.http import parse_etags
+
+from .models import Projects
+
+
+def bump_project_version(project_id):
+    """Mark every cached representation of the project's content as stale"""
+    Projects.objects.filter(id=project_id).update(version=F("version") + 1)
+
+
+def bump_projects_version(project_ids, batch_size=500):
+    """bump_project_version of many projects, with one UPDATE per batch"""
+    project_ids = sorted(project_ids)
+    for start in range(0, len(project_ids), batch_size):
+        Projects.objects.filter(id__in=project_ids[start : start + batch_size]).update(
+            version=F("version") + 1
+        )
+
+
+def bump_issue_project_version(issue_id):
+    Projects.objects.filter(issues__id=issue_id).update(version=F("version") + 1)
+
+
+def project_version_queryset(project_id):
+    return Projects.objects.filter(id=project_id).values_list("version", flat=True)
+
+
+def get_project_version(project_id):
+    return project_version_queryset(project_id).first()
+
+
+async def aget_project_version(project_id):
+    return await project_version_queryset(project_id).afirst()
+
+
+def project_etag(request, project_id, version=None):
+    """
+    Strong ETag of a project-scoped GET: the project version plus a digest of
+    the full path, so each list page and each sub-resource gets its own tag.
+    """
+    if version is None:
+        version = get_project_version(project_id)
+        if version is None:
+            return None
+
+    digest = sha1(request.get_full_path().encode("utf-8")).hexdigest()[:16]
+    return '"%s-%s-%s"' % (project_id, version, digest)
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header or etag is None:
+        return False
+
+    etags = [tag[2:] if tag.startswith("W/") else tag for tag in parse_etags(header)]
+    return "*" in etags or etag in etags
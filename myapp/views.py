@@ -1,18 +1,60 @@
+import os
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db import IntegrityError, transaction
 from django.core.exceptions import ObjectDoesNotExist
-
-from .models import Projects, Contributors, Issues, Comments
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+
+from .batch import run_request
+from .changes import ChangesGone, changes_since
+from .filters import QueryParamsFilter
+from .export import FORMATS as EXPORT_FORMATS, buffered
+from .jobs import enqueue, job_queryset, pending_job
+from .tasks import create_issues
+from .access import get_project_access, invalidate_project_access
+from .models import Projects, Contributors, Issues, Comments, Jobs
+from .queries import (
+    project_queryset,
+    contributors_queryset,
+    contributor_queryset,
+    issues_queryset,
+    issue_queryset,
+    issue_version_queryset,
+    comments_queryset,
+    comment_queryset,
+    comment_version_queryset,
+)
+from .project_cache import (
+    add_counters,
+    serialized_projects,
+    invalidate_user_projects,
+)
+from .pagination import (
+    IdKeysetPagination,
+    CreatedTimeKeysetPagination,
+    RecentFirstKeysetPagination,
+)
+from .search import SearchPagination, match_query
+from .versioning import (
+    bump_project_version,
+    project_etag,
+    etag_matches,
+)
 from .serializers import (
+    values_reader,
     ProjectsSerializer,
     ContributorsSerializer,
     IssuesSerializer,
     CommentsSerializer,
+    JobsSerializer,
 )
 
 User = get_user_model()
@@ -28,37 +70,110 @@ class MultipleSerializerMixin:
         return super().get_serializer_class()
 
 
-class ProjectView(MultipleSerializerMixin, APIView):
+class PaginatedViewMixin:
+
+    pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class SparseFieldsViewMixin:
+    """Reads ?fields=a,b,c: the only fields kept in the response"""
+
+    def get_requested_fields(self, request):
+        value = request.query_params.get("fields")
+        if not value:
+            return None
+
+        fields = frozenset(name.strip() for name in value.split(",") if name.strip())
+        unknown = fields - set(values_reader(self.serializer_class).names)
+        if unknown:
+            raise ValidationError(
+                {"fields": ["Champ(s) inconnu(s) : " + ", ".join(sorted(unknown))]}
+            )
+        return fields
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match with 304 from the project version alone, and tags
+    successful responses with the same ETag.
+    """
+
+    etag = None
+
+    def not_modified(self, request, project_id, version=None):
+        self.etag = project_etag(request, project_id, version)
+
+        if etag_matches(request, self.etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": self.etag}
+            )
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag is not None and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = self.etag
+        return response
+
+
+def project_not_found(project_id, e=""):
+    """
+    404 for a project deleted after its membership was cached, possibly by
+    another process: the stale entries are dropped on the way.
+    """
+    invalidate_project_access(project_id)
+    response = {"message": ("Projet non trouvé ! %s" % e).rstrip()}
+    return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+
+def job_accepted(request, job, message):
+    """202 response for an enqueued job, pointing at its status"""
+    response = {"message": message, "job": JobsSerializer(job).data}
+    location = request.build_absolute_uri(
+        reverse("project-job", args=[job.project_id, job.id])
+    )
+    return Response(
+        data=response, status=status.HTTP_202_ACCEPTED, headers={"Location": location}
+    )
+
+
+class ProjectView(
+    MultipleSerializerMixin, SparseFieldsViewMixin, PaginatedViewMixin, APIView
+):
     """View for /project/"""
 
     permission_classes = [IsAuthenticated]
 
     serializer_class = ProjectsSerializer
+    pagination_class = IdKeysetPagination
 
     def get(self, request, *args, **kwargs):
-        contributors = Contributors.objects.filter(user_id=request.user.id)
-        contributors_project_ids = []
-
-        for contributor in contributors:
-            contributors_project_ids.append(contributor.project_id.id)
-
-        projects = Projects.objects.filter(
-            Q(author_user_id=request.user.id) | Q(id__in=contributors_project_ids)
-        )
+        fields = self.get_requested_fields(request)
+        projects = serialized_projects(request.user.id, self.serializer_class)
 
-        serializer = self.serializer_class(projects, many=True)
+        page = self.paginator.paginate_list(projects, Projects, request, view=self)
+        page = add_counters(page)
+        if fields is not None:
+            page = [
+                {name: value for name, value in row.items() if name in fields}
+                for row in page
+            ]
 
-        return Response(serializer.data)
+        return self.paginator.get_paginated_response(page)
 
     def post(self, request: Request):
         data = request.data
 
         serializer = self.serializer_class(data=data)
 
-        user = User.objects.get(id=request.user.id)
-
         if serializer.is_valid():
-            serializer.save(author_user_id=user)
+            serializer.save(author_user_id=request.user)
 
             response = {
                 "message": "Projet créé avec succès !",
@@ -70,7 +185,9 @@ class ProjectView(MultipleSerializerMixin, APIView):
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class DetailProjectView(MultipleSerializerMixin, APIView):
+class DetailProjectView(
+    MultipleSerializerMixin, SparseFieldsViewMixin, ConditionalGetMixin, APIView
+):
     """View for /project/<project_id>"""
 
     permission_classes = [IsAuthenticated]
@@ -78,31 +195,31 @@ class DetailProjectView(MultipleSerializerMixin, APIView):
     serializer_class = ProjectsSerializer
 
     def get(self, request, project_id, *args, **kwargs):
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
-
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
-
         try:
-            projects = Projects.objects.get(id=project_id)
+            access = get_project_access(project_id, request.user.id)
         except ObjectDoesNotExist as e:
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
-
-        if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
-        ):
+        if not access.is_member:
             response = {"message": "Vous n'avez pas accès à ce projet !"}
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
-        else:
-            serializer = self.serializer_class(projects, many=False)
-            return Response(serializer.data)
+        fields = self.get_requested_fields(request)
+        try:
+            projects = project_queryset(
+                project_id, values_reader(self.serializer_class, fields).sources
+            ).get()
+        except ObjectDoesNotExist as e:
+            return project_not_found(project_id, e)
+
+        not_modified = self.not_modified(request, project_id, projects.version)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.serializer_class(projects, many=False, fields=fields)
+        return Response(serializer.data)
 
     def put(self, request, project_id):
         data = request.data
@@ -113,11 +230,11 @@ class DetailProjectView(MultipleSerializerMixin, APIView):
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
         serializer = self.serializer_class(project, data=data)
 
-        if serializer.is_valid() and project.author_user_id == current_user:
+        if serializer.is_valid() and project.author_user_id_id == current_user.id:
             serializer.save()
 
             response = {
@@ -142,30 +259,320 @@ class DetailProjectView(MultipleSerializerMixin, APIView):
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
-        if project.author_user_id == current_user:
-            project.delete()
+        if project.author_user_id_id == current_user.id:
+            job = pending_job("delete_project", project.id) or enqueue(
+                "delete_project", project.id, current_user
+            )
 
+            return job_accepted(request, job, "Suppression du projet programmée.")
+        else:
             response = {
-                "message": "Projet supprimé avec succès !",
+                "message": "Vous n'êtes pas l'auteur de ce projet : action non autorisé !",
             }
 
-            return Response(data=response, status=status.HTTP_200_OK)
-        else:
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+
+class ProjectExportView(APIView):
+    """View for /project/<project_id>/export/"""
+
+    permission_classes = [IsAuthenticated]
+
+    formats = EXPORT_FORMATS
+
+    def get(self, request, project_id, *args, **kwargs):
+        try:
+            access = get_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
+
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+        # "format" is already used by DRF for content negotiation
+        output = request.query_params.get("output", "json")
+        if output not in self.formats:
+            response = {"message": "Format d'export inconnu : json ou ndjson."}
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, extension, iter_export = self.formats[output]
+        try:
+            project = Projects.objects.get(id=project_id)
+        except ObjectDoesNotExist as e:
+            return project_not_found(project_id, e)
+
+        response = StreamingHttpResponse(
+            buffered(iter_export(project)),
+            content_type=content_type + "; charset=utf-8",
+        )
+        response["Content-Disposition"] = 'attachment; filename="project-%d.%s"' % (
+            project.id,
+            extension,
+        )
+        return response
+
+
+class ProjectSearchView(ConditionalGetMixin, APIView):
+    """View for /project/<project_id>/search/?q=..."""
+
+    permission_classes = [IsAuthenticated]
+
+    pagination_class = SearchPagination
+
+    def get(self, request, project_id, *args, **kwargs):
+        try:
+            access = get_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
+
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+        match = match_query(request.query_params.get("q", ""))
+        if not match:
+            response = {"message": "Le paramètre de recherche q est vide."}
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        not_modified = self.not_modified(request, project_id)
+        if not_modified is not None:
+            return not_modified
+        if self.etag is None:
+            # No version: the project is gone
+            return project_not_found(project_id)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_search(int(project_id), match, request, view=self)
+        results = [
+            {
+                "type": hit["type"],
+                "id": hit["id"],
+                "issue_id": hit["issue_id"],
+                "title": hit["title"],
+                "snippet": hit["snippet"],
+            }
+            for hit in page
+        ]
+        return paginator.get_paginated_response(results)
+
+
+class ProjectChangesView(APIView):
+    """View for /project/<project_id>/changes/?since=<seq>"""
+
+    permission_classes = [IsAuthenticated]
+
+    page_size = 1000
+    max_page_size = 10000
+
+    def get(self, request, project_id, *args, **kwargs):
+        try:
+            access = get_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
+
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            since = request.query_params.get("since")
+            since = None if since is None else int(since)
+            limit = int(request.query_params.get("page_size", self.page_size))
+            if (since is not None and since < 0) or limit < 1:
+                raise ValueError()
+        except ValueError:
+            response = {"message": "Paramètres since ou page_size invalides."}
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changes = changes_since(
+                int(project_id), since, min(limit, self.max_page_size)
+            )
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+        except ChangesGone as e:
             response = {
-                "message": "Vous n'êtes pas l'auteur de ce projet : action non autorisé !",
+                "message": "Historique compacté : rechargez le projet puis "
+                "reprenez à partir du numéro seq courant.",
+                "floor": e.args[0],
             }
+            return Response(data=response, status=status.HTTP_410_GONE)
+
+        return Response(changes)
+
+
+class ProjectJobsMixin:
+    """Access to the jobs of /project/<project_id>/jobs/"""
+
+    def get_jobs(self, request, project_id):
+        """
+        The jobs the user may see on project_id, or an error Response. Once
+        the project is gone (deleted by one of them) users keep seeing the
+        jobs they enqueued on it.
+        """
+        try:
+            access = get_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist:
+            jobs = job_queryset().filter(project_id=project_id, user_id=request.user)
+            if not jobs.exists():
+                response = {"message": "Projet non trouvé !"}
+                return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+            return jobs
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
+        return job_queryset().filter(project_id=project_id)
+
+    def get_job(self, request, project_id, job_id):
+        jobs = self.get_jobs(request, project_id)
+        if isinstance(jobs, Response):
+            return jobs
+
+        job = jobs.filter(id=job_id).first()
+        if job is None:
+            response = {"message": "Tâche non trouvée !"}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+        return job
+
+
+class ProjectJobsView(ProjectJobsMixin, PaginatedViewMixin, APIView):
+    """View for /project/<project_id>/jobs/"""
+
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = JobsSerializer
+    pagination_class = RecentFirstKeysetPagination
+
+    formats = EXPORT_FORMATS
+
+    def get(self, request, project_id, *args, **kwargs):
+        jobs = self.get_jobs(request, project_id)
+        if isinstance(jobs, Response):
+            return jobs
+
+        page = self.paginator.paginate_queryset(jobs, request, view=self)
+        serializer = self.serializer_class(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
+
+    def post(self, request, project_id):
+        current_user = request.user
+
+        try:
+            access = get_project_access(project_id, current_user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
+            response = {"message": "Vous n'avez pas accès à ce projet !"}
+
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+        kind = request.data.get("kind")
+
+        if kind == "export_project":
+            output = request.data.get("output", "json")
+            if output not in self.formats:
+                response = {"message": "Format d'export inconnu : json ou ndjson."}
+                return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+            job = enqueue(kind, project_id, current_user, output=output)
+            return job_accepted(request, job, "Export du projet programmé.")
+
+        elif kind == "reconcile_counters":
+            if not access.is_author(current_user.id):
+                response = {
+                    "message": "Vous n'êtes pas l'auteur de ce projet : action non autorisé !",
+                }
+
+                return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+            job = pending_job(kind, project_id) or enqueue(
+                kind, project_id, current_user
+            )
+            return job_accepted(request, job, "Recalcul des compteurs programmé.")
+
+        response = {
+            "message": "Type de tâche inconnu : export_project ou reconcile_counters."
+        }
+        return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+
+class JobView(ProjectJobsMixin, APIView):
+    """View for /project/<project_id>/jobs/<job_id>"""
+
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = JobsSerializer
+
+    def get(self, request, project_id, job_id, *args, **kwargs):
+        job = self.get_job(request, project_id, job_id)
+        if isinstance(job, Response):
+            return job
+
+        serializer = self.serializer_class(job)
+        return Response(serializer.data)
+
 
-class ContributorsView(MultipleSerializerMixin, APIView):
+class JobFileView(ProjectJobsMixin, APIView):
+    """View for /project/<project_id>/jobs/<job_id>/file"""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_id, job_id, *args, **kwargs):
+        job = self.get_job(request, project_id, job_id)
+        if isinstance(job, Response):
+            return job
+
+        if job.kind != "export_project":
+            response = {"message": "Cette tâche ne produit pas de fichier."}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if job.status in (Jobs.QUEUED, Jobs.RUNNING):
+            response = {"message": "Export en cours : réessayez plus tard."}
+            return Response(data=response, status=status.HTTP_409_CONFLICT)
+
+        path = None
+        if job.status == Jobs.SUCCEEDED:
+            path = os.path.join(settings.SOFTDESK_JOB_FILES_DIR, job.result["file"])
+        if path is None or not os.path.exists(path):
+            response = {"message": "Fichier d'export non disponible."}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        return FileResponse(
+            open(path, "rb"),
+            as_attachment=True,
+            filename="project-%d.%s" % (job.project_id, path.rsplit(".", 1)[-1]),
+            content_type=job.result["content_type"] + "; charset=utf-8",
+        )
+
+
+class ContributorsView(
+    MultipleSerializerMixin,
+    SparseFieldsViewMixin,
+    ConditionalGetMixin,
+    PaginatedViewMixin,
+    APIView,
+):
     """View for /project/<project_id>/users/"""
 
     permission_classes = [IsAuthenticated]
 
     serializer_class = ContributorsSerializer
+    pagination_class = IdKeysetPagination
 
     def get(self, request, project_id, *args, **kwargs):
         try:
@@ -174,12 +581,20 @@ class ContributorsView(MultipleSerializerMixin, APIView):
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        contributors = Contributors.objects.filter(project_id=project)
+        not_modified = self.not_modified(request, project.id, project.version)
+        if not_modified is not None:
+            return not_modified
 
-        serializer = self.serializer_class(contributors, many=True)
+        contributors = contributors_queryset(project.id)
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        page = self.paginator.paginate_values(
+            contributors, reader.columns, request, view=self
+        )
 
-        if len(contributors) > 0:
-            return Response(serializer.data)
+        if len(page) > 0:
+            return self.paginator.get_paginated_response(reader.to_representation(page))
 
         else:
             response = {
@@ -199,15 +614,17 @@ class ContributorsView(MultipleSerializerMixin, APIView):
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        author = project.author_user_id
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
-        contributors = Contributors.objects.filter(
-            project_id=project, user_id=data["user_id"]
-        )
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        already_contributor = contributor_queryset(
+            project.id, serializer.validated_data["user_id"]
+        ).exists()
 
         if (
-            serializer.is_valid() and len(contributors) < 1 and author == current_user
+            not already_contributor and project.author_user_id_id == current_user.id
         ):  # verify if contributors doesn't already exist
             serializer.save(project_id=project)
 
@@ -246,11 +663,11 @@ class UserContributorsView(MultipleSerializerMixin, APIView):
             response = {"message": "Utilisateur non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
         contributor = Contributors.objects.get(project_id=project, user_id=user)
 
-        if project.author_user_id == current_user:
+        if project.author_user_id_id == current_user.id:
             contributor.delete()
 
             response = {
@@ -266,77 +683,192 @@ class UserContributorsView(MultipleSerializerMixin, APIView):
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
 
-class ProjectIssueView(MultipleSerializerMixin, APIView):
-    """View for /project/<project_id>/issues/"""
+class ContributorsBatchView(MultipleSerializerMixin, APIView):
+    """View for /project/<project_id>/users/batch/"""
 
     permission_classes = [IsAuthenticated]
 
-    serializer_class = IssuesSerializer
+    serializer_class = ContributorsSerializer
+    batch_max_items = 1000
 
-    def get(self, request, project_id, *args, **kwargs):
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
+    def post(self, request, project_id):
+        """
+        Add and remove several contributors in one transaction.
 
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
+        Body: {"add": [{"user_id", "permission", "role"}, ...], "remove": [user_id, ...]}
+        Users already in the project are left untouched, so the call can be
+        replayed safely. Answers with the resulting list of contributors.
+        """
+        data = request.data
 
         try:
-            projects = Projects.objects.get(id=project_id)
+            project = Projects.objects.get(id=project_id)
         except ObjectDoesNotExist as e:
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        if project.author_user_id_id != request.user.id:
+            response = {
+                "message": "Vous n'êtes pas l'auteur de ce projet : action non autorisé !",
+            }
+
+            return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
-        issue = Issues.objects.filter(project_id=projects.id)
-        print(issue)
+        to_add = data.get("add", []) if isinstance(data, dict) else None
+        to_remove = data.get("remove", []) if isinstance(data, dict) else None
 
         if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
+            not isinstance(to_add, list)
+            or not isinstance(to_remove, list)
+            or len(to_add) + len(to_remove) > self.batch_max_items
         ):
+            response = {
+                "message": "Le corps doit contenir les listes 'add' et/ou 'remove' "
+                "(maximum %d éléments)." % self.batch_max_items,
+            }
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        user_ids = set()
+        for item in to_add:
+            try:
+                user_ids.add(int(item["user_id"]))
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        serializer = self.serializer_class(
+            data=to_add, many=True, context={"users": User.objects.in_bulk(user_ids)}
+        )
+
+        try:
+            remove_ids = [int(user_id) for user_id in to_remove]
+        except (TypeError, ValueError):
+            response = {"remove": ["La liste doit contenir des identifiants."]}
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        if not serializer.is_valid():
+            response = {"add": serializer.errors}
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            Contributors.objects.bulk_create(
+                [
+                    Contributors(project_id=project, **attrs)
+                    for attrs in serializer.validated_data
+                ],
+                ignore_conflicts=True,
+            )
+            Contributors.objects.filter(
+                project_id=project, user_id__in=remove_ids
+            ).delete()
+            bump_project_version(project.id)
+            transaction.on_commit(lambda: invalidate_project_access(project.id))
+            transaction.on_commit(
+                lambda: invalidate_user_projects(
+                    *[attrs["user_id"].id for attrs in serializer.validated_data]
+                )
+            )
+
+        contributors = Contributors.objects.filter(project_id=project).order_by("id")
+
+        response = {
+            "message": "Contributeurs mis à jour avec succès !",
+            "data": self.serializer_class(contributors, many=True).data,
+        }
+
+        return Response(data=response, status=status.HTTP_200_OK)
+
+
+class ProjectIssueView(
+    MultipleSerializerMixin,
+    SparseFieldsViewMixin,
+    ConditionalGetMixin,
+    PaginatedViewMixin,
+    APIView,
+):
+    """View for /project/<project_id>/issues/"""
+
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = IssuesSerializer
+    pagination_class = CreatedTimeKeysetPagination
+    bulk_max_items = 10000
+    bulk_sync_max_items = getattr(settings, "SOFTDESK_ISSUE_BULK_SYNC_MAX_ITEMS", 100)
+
+    issue_filter = QueryParamsFilter(
+        Issues,
+        filters={
+            "status": "status",
+            "priority": "priority",
+            "tag": "tag",
+            "assignee_user_id": "assignee_user_id",
+            "created_after": "created_time__gte",
+            "created_before": "created_time__lt",
+        },
+        orderings=("created_time", "id", "priority", "status"),
+        default_ordering=CreatedTimeKeysetPagination.ordering,
+    )
+
+    def get(self, request, project_id, *args, **kwargs):
+        try:
+            access = get_project_access(project_id, request.user.id)
+        except ObjectDoesNotExist as e:
+            response = {"message": "Projet non trouvé ! " + str(e)}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        if not access.is_member:
             response = {"message": "Vous n'avez pas accès à ce projet !"}
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
-        else:
-            serializer = self.serializer_class(issue, many=True)
-            return Response(serializer.data)
+        issue = self.issue_filter.filter_queryset(request, issues_queryset(project_id))
+        self.paginator.ordering = self.issue_filter.get_ordering(request)
 
-    def post(self, request, project_id):
-        data = request.data
+        not_modified = self.not_modified(request, project_id)
+        if not_modified is not None:
+            return not_modified
+        if self.etag is None:
+            # No version: the project is gone
+            return project_not_found(project_id)
 
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        page = self.paginator.paginate_values(issue, reader.columns, request, view=self)
+        return self.paginator.get_paginated_response(reader.to_representation(page))
 
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
+    def post(self, request, project_id):
+        data = request.data
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
         try:
-            projects = Projects.objects.get(id=project_id)
+            access = get_project_access(project_id, current_user.id)
         except ObjectDoesNotExist as e:
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(data=data)
-
-        project = Projects.objects.get(id=project_id)
-
-        if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
-        ):
+        if not access.is_member:
             response = {
                 "message": "Vous ne participez pas à ce projet : Accès non autorisé !"
             }
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
+        elif isinstance(data, list):
+            return self.post_many(data, project_id, current_user)
+
         else:
+            serializer = self.serializer_class(data=data)
+
             if serializer.is_valid():
-                serializer.save(project_id=project, author_user_id=current_user)
+                try:
+                    serializer.save(
+                        project_id_id=project_id, author_user_id=current_user
+                    )
+                except IntegrityError:
+                    if Projects.objects.filter(id=project_id).exists():
+                        raise
+                    return project_not_found(project_id)
 
                 response = {
                     "message": "Problème créé avec succès !",
@@ -347,6 +879,29 @@ class ProjectIssueView(MultipleSerializerMixin, APIView):
 
             return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def post_many(self, data, project_id, current_user):
+        """Create a list of issues at once: all of them or none"""
+
+        if len(data) > self.bulk_max_items:
+            response = {
+                "message": "Trop de problèmes dans une seule requête (maximum %d)."
+                % self.bulk_max_items
+            }
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(data) > self.bulk_sync_max_items:
+            job = enqueue("import_issues", project_id, current_user, issues=data)
+            message = "Création de %d problème(s) programmée." % len(data)
+            return job_accepted(self.request, job, message)
+
+        try:
+            status_code, response = create_issues(data, project_id, current_user)
+        except IntegrityError:
+            if Projects.objects.filter(id=project_id).exists():
+                raise
+            return project_not_found(project_id)
+        return Response(data=response, status=status_code)
+
 
 class IssueView(MultipleSerializerMixin, APIView):
     """View for /project/<project_id>/issues/<issue_id>"""
@@ -359,17 +914,16 @@ class IssueView(MultipleSerializerMixin, APIView):
         data = request.data
 
         try:
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
-            print(issue)
+            issue = issue_queryset(project_id, issue_id).get()
         except ObjectDoesNotExist as e:
             response = {"message": "Projet ou problème non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
         serializer = self.serializer_class(issue, data=data)
 
-        if serializer.is_valid() and issue.author_user_id == current_user:
+        if serializer.is_valid() and issue.author_user_id_id == current_user.id:
             serializer.save()
 
             response = {
@@ -393,14 +947,14 @@ class IssueView(MultipleSerializerMixin, APIView):
     def delete(self, request, project_id, issue_id):
 
         try:
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
+            issue = issue_queryset(project_id, issue_id).get()
         except ObjectDoesNotExist as e:
             response = {"message": "Projet ou problème non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
-        if issue.author_user_id == current_user:
+        if issue.author_user_id_id == current_user.id:
             issue.delete()
 
             response = {
@@ -416,67 +970,72 @@ class IssueView(MultipleSerializerMixin, APIView):
         return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
 
-class IssueCommentView(MultipleSerializerMixin, APIView):
+class IssueCommentView(
+    MultipleSerializerMixin,
+    SparseFieldsViewMixin,
+    ConditionalGetMixin,
+    PaginatedViewMixin,
+    APIView,
+):
     """View for /project/<project_id>/issues/<issue_id>/comments/"""
 
     permission_classes = [IsAuthenticated]
 
     serializer_class = CommentsSerializer
+    pagination_class = CreatedTimeKeysetPagination
 
     def get(self, request, project_id, issue_id, *args, **kwargs):
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
-
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
-
-        current_user = User.objects.get(id=request.user.id)
-
         try:
-            projects = Projects.objects.get(id=project_id)
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
+            access = get_project_access(project_id, request.user.id)
         except ObjectDoesNotExist as e:
             response = {"message": "Problème ou projet non trouvé ! : " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        comment = Comments.objects.filter(issue_id=issue)
-
-        if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
-        ):
+        if not access.is_member:
             response = {"message": "Vous n'avez pas accès à ce projet !"}
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
-        else:
-            if len(comment) > 0:
-                serializer = self.serializer_class(comment, many=True)
-                return Response(serializer.data)
-            else:
-                response = {
-                    "message": "Il n'a pas encore de commentaire sur ce problème.",
-                }
+        # The issue is checked before the ETag: a deleted issue is not "not
+        # modified"
+        version = issue_version_queryset(project_id, issue_id).first()
+        if version is None:
+            response = {"message": "Problème ou projet non trouvé !"}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-                return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+        not_modified = self.not_modified(request, project_id, version)
+        if not_modified is not None:
+            return not_modified
 
-    def post(self, request, project_id, issue_id):
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
+        comment = comments_queryset(issue_id)
+
+        reader = values_reader(
+            self.serializer_class, self.get_requested_fields(request)
+        )
+        page = self.paginator.paginate_values(
+            comment, reader.columns, request, view=self
+        )
+
+        if len(page) > 0:
+            return self.paginator.get_paginated_response(reader.to_representation(page))
+        else:
+            response = {
+                "message": "Il n'a pas encore de commentaire sur ce problème.",
+            }
 
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+    def post(self, request, project_id, issue_id):
+        current_user = request.user
 
         try:
-            projects = Projects.objects.get(id=project_id)
+            access = get_project_access(project_id, current_user.id)
         except ObjectDoesNotExist as e:
             response = {"message": "Projet non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
+            issue = issue_queryset(project_id, issue_id).get()
         except ObjectDoesNotExist as e:
             response = {"message": "Problème non trouvé ! " + str(e)}
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
@@ -485,10 +1044,7 @@ class IssueCommentView(MultipleSerializerMixin, APIView):
 
         serializer = self.serializer_class(data=data)
 
-        if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
-        ):
+        if not access.is_member:
             response = {
                 "message": "Vous ne participez pas à ce projet : Accès non autorisé !"
             }
@@ -509,7 +1065,9 @@ class IssueCommentView(MultipleSerializerMixin, APIView):
             return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CommentView(MultipleSerializerMixin, APIView):
+class CommentView(
+    MultipleSerializerMixin, SparseFieldsViewMixin, ConditionalGetMixin, APIView
+):
     """View for /project/<project_id>/issues/<issue_id>/comments/<comment_id>"""
 
     permission_classes = [IsAuthenticated]
@@ -517,47 +1075,57 @@ class CommentView(MultipleSerializerMixin, APIView):
     serializer_class = CommentsSerializer
 
     def get(self, request, project_id, issue_id, comment_id, *args, **kwargs):
-        contributors = Contributors.objects.filter(project_id=project_id)
-        contributors_user_ids = []
-
-        for contributor in contributors:
-            contributors_user_ids.append(contributor.user_id.id)
-
-        current_user = User.objects.get(id=request.user.id)
-
         try:
-            projects = Projects.objects.get(id=project_id)
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
-            comment = Comments.objects.get(id=comment_id, issue_id=issue)
+            access = get_project_access(project_id, request.user.id)
         except ObjectDoesNotExist as e:
             response = {
                 "message": "Projet, problème ou commentaire non trouvé ! : " + str(e)
             }
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        if (
-            current_user.id not in contributors_user_ids
-            and projects.author_user_id != current_user
-        ):
+        if not access.is_member:
             response = {
                 "message": "Vous ne participez pas à ce projet : Accès refusé !"
             }
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
 
-        else:
+        # The comment is checked before the ETag, as in IssueCommentView
+        version = comment_version_queryset(project_id, issue_id, comment_id).first()
+        if version is None:
+            response = {"message": "Projet, problème ou commentaire non trouvé !"}
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-            serializer = self.serializer_class(comment, many=False)
+        not_modified = self.not_modified(request, project_id, version)
+        if not_modified is not None:
+            return not_modified
 
-            return Response(serializer.data)
+        fields = self.get_requested_fields(request)
+
+        try:
+            comment = comment_queryset(
+                project_id,
+                issue_id,
+                comment_id,
+                values_reader(self.serializer_class, fields).sources,
+            ).get()
+        except ObjectDoesNotExist as e:
+            response = {
+                "message": "Projet, problème ou commentaire non trouvé ! : " + str(e)
+            }
+            return Response(data=response, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.serializer_class(comment, many=False, fields=fields)
+
+        return Response(serializer.data)
 
     def put(self, request, project_id, issue_id, comment_id):
         data = request.data
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
         try:
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
+            issue = issue_queryset(project_id, issue_id).get()
             comment = Comments.objects.get(id=comment_id, issue_id=issue)
         except ObjectDoesNotExist as e:
             response = {
@@ -567,7 +1135,7 @@ class CommentView(MultipleSerializerMixin, APIView):
 
         serializer = self.serializer_class(comment, data=data)
 
-        if serializer.is_valid() and comment.author_user_id == current_user:
+        if serializer.is_valid() and comment.author_user_id_id == current_user.id:
             serializer.save()
 
             response = {
@@ -587,7 +1155,7 @@ class CommentView(MultipleSerializerMixin, APIView):
     def delete(self, request, project_id, issue_id, comment_id):
 
         try:
-            issue = Issues.objects.get(id=issue_id, project_id=project_id)
+            issue = issue_queryset(project_id, issue_id).get()
             comment = Comments.objects.get(id=comment_id, issue_id=issue)
         except ObjectDoesNotExist as e:
             response = {
@@ -595,9 +1163,9 @@ class CommentView(MultipleSerializerMixin, APIView):
             }
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
-        current_user = User.objects.get(id=request.user.id)
+        current_user = request.user
 
-        if comment.author_user_id == current_user:
+        if comment.author_user_id_id == current_user.id:
             comment.delete()
 
             response = {
@@ -611,3 +1179,34 @@ class CommentView(MultipleSerializerMixin, APIView):
             }
 
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
+
+
+class BatchView(APIView):
+    """View for /batch/"""
+
+    permission_classes = [IsAuthenticated]
+
+    max_requests = getattr(settings, "SOFTDESK_BATCH_MAX_REQUESTS", 50)
+
+    def post(self, request):
+        """
+        Run several API requests in one round trip.
+
+        Body: {"requests": [{"method", "path", "body", "headers"}, ...]}, path
+        being an /api/ path with its query string. The sub-requests run in
+        order, each on its own, with the user of this request. Answers with
+        {"responses": [{"status", "headers", "body"}, ...]} in the same order.
+        """
+        data = request.data
+        items = data.get("requests") if isinstance(data, dict) else None
+
+        if not isinstance(items, list) or not 0 < len(items) <= self.max_requests:
+            response = {
+                "message": "Le corps doit contenir la liste 'requests' "
+                "(de 1 à %d requêtes)." % self.max_requests,
+            }
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        responses = [run_request(request, item) for item in items]
+
+        return Response(data={"responses": responses}, status=status.HTTP_200_OK)
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'softdesk.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from myapp.event_stream import EventStreamRouter  # noqa: E402
+
+# Server-Sent Events streams are served next to Django, see myapp.event_stream
+application = EventStreamRouter(django_application)
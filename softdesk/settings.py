@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.instrumentation.RequestTimingMiddleware',
+    'myapp.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,13 +82,56 @@ WSGI_APPLICATION = 'softdesk.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# SQLite connection profiles, selected with the SOFTDESK_DATABASE_PROFILE
+# environment variable. The PRAGMAS are run by myapp.database on every new
+# connection; "production" switches to WAL so that readers no longer wait on
+# writers, and keeps connections open across requests.
+SOFTDESK_DATABASE_PROFILES = {
+    'development': {
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {},
+    },
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            'busy_timeout': 5000,
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
+SOFTDESK_DATABASE_PROFILE = os.environ.get('SOFTDESK_DATABASE_PROFILE', 'development')
+if SOFTDESK_DATABASE_PROFILE not in SOFTDESK_DATABASE_PROFILES:
+    raise ImproperlyConfigured(
+        'Unknown SOFTDESK_DATABASE_PROFILE %r' % SOFTDESK_DATABASE_PROFILE
+    )
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': SOFTDESK_DATABASE_PROFILES[SOFTDESK_DATABASE_PROFILE]['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas: SOFTDESK_READ_REPLICAS=/path/a.sqlite3,/path/b.sqlite3 adds
+# one database alias per file. myapp.routers.ReplicaRouter sends the reads of
+# a request to them until it writes, and everything else to 'default'.
+# Keeping the files in sync with the primary is left to the deployment
+# (Litestream, LiteFS...); manage.py refresh_replicas copies it locally.
+SOFTDESK_READ_REPLICAS = []
+for path in filter(None, os.environ.get('SOFTDESK_READ_REPLICAS', '').split(',')):
+    alias = 'replica_%d' % (len(SOFTDESK_READ_REPLICAS) + 1)
+    DATABASES[alias] = dict(DATABASES['default'], NAME=path, TEST={'MIRROR': 'default'})
+    SOFTDESK_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['myapp.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -131,5 +179,106 @@ AUTH_USER_MODEL = "authentication.User"
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100,
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',)
+    'DEFAULT_AUTHENTICATION_CLASSES': ('authentication.authentication.CachedJWTAuthentication',)
+}
+
+# Number of (project, user) membership lookups kept in memory by myapp.access,
+# and for how many seconds. Invalidations reach the other processes at once
+# through CACHES when it is shared, after this many seconds otherwise.
+SOFTDESK_ACCESS_CACHE_SIZE = 4096
+SOFTDESK_ACCESS_CACHE_TIMEOUT = 10
+
+# Users resolved from JWT claims by authentication.CachedJWTAuthentication are
+# kept in memory for this many seconds (per process, dropped on User save)
+SOFTDESK_USER_CACHE_SIZE = 1024
+SOFTDESK_USER_CACHE_TIMEOUT = 60
+
+# Cache backend of the per-user project lists (myapp.project_cache). The
+# local-memory default is per process: use a shared backend (Redis,
+# Memcached) when running several workers so invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'softdesk',
+    }
+}
+
+SOFTDESK_PROJECT_LIST_CACHE_TIMEOUT = 300
+
+# Projects with more issues and comments than this are deleted by
+# myapp.deletion in transactions of this many rows, so that the SQLite write
+# lock is released between them
+SOFTDESK_PROJECT_DELETE_CHUNK_SIZE = 5000
+
+# Entries of the project change logs (myapp.changes) older than this are
+# removed by manage.py compact_changes; clients that last synced before
+# have to reload the project
+SOFTDESK_CHANGE_LOG_RETENTION_DAYS = 30
+
+# Server-Sent Events (myapp.events, ASGI only): each process polls the change
+# log of the streamed projects every SOFTDESK_EVENTS_POLL_INTERVAL seconds,
+# queues at most SOFTDESK_EVENTS_QUEUE_SIZE events per client (a slower
+# client is disconnected and resumes with Last-Event-ID), replays at most
+# SOFTDESK_EVENTS_REPLAY_MAX entries to a reconnecting client and writes a
+# comment to idle streams every SOFTDESK_EVENTS_HEARTBEAT seconds
+SOFTDESK_EVENTS_POLL_INTERVAL = 1.0
+SOFTDESK_EVENTS_QUEUE_SIZE = 1000
+SOFTDESK_EVENTS_REPLAY_MAX = 1000
+SOFTDESK_EVENTS_HEARTBEAT = 15.0
+
+# Background jobs (myapp.jobs), run by manage.py run_jobs with a pool of
+# SOFTDESK_JOB_PROCESSES processes. A job still running after
+# SOFTDESK_JOB_LEASE seconds is considered lost and run again; failed
+# attempts are retried after SOFTDESK_JOB_RETRY_DELAY seconds, doubled each
+# time. Export files are written to SOFTDESK_JOB_FILES_DIR.
+SOFTDESK_JOB_PROCESSES = 2
+SOFTDESK_JOB_LEASE = 600
+SOFTDESK_JOB_RETRY_DELAY = 10
+SOFTDESK_JOB_FILES_DIR = BASE_DIR / 'job_files'
+
+# Issue lists posted with more items than this are created by a background
+# job (202) instead of within the request (201)
+SOFTDESK_ISSUE_BULK_SYNC_MAX_ITEMS = 100
+
+# Sub-requests accepted by one POST /api/batch/ (myapp.batch)
+SOFTDESK_BATCH_MAX_REQUESTS = 50
+
+# Issue statuses left out of Projects.open_issue_count (myapp.counters); run
+# manage.py reconcile_counters after changing them
+SOFTDESK_CLOSED_ISSUE_STATUSES = ['Terminé']
+
+# Share of requests measured by myapp.instrumentation.RequestTimingMiddleware
+# (0 disables it, 1 measures every request)
+SOFTDESK_TIMING_SAMPLE_RATE = float(os.environ.get('SOFTDESK_TIMING_SAMPLE_RATE', '0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'softdesk.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'softdesk.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'softdesk.events': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'softdesk.batch': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
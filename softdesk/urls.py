@@ -18,15 +18,32 @@ from django.urls import path, include
 from rest_framework import routers
 
 from authentication.views import SignUpView, LoginView
+from authentication.async_views import AsyncLoginView
 from myapp.views import (
     ProjectView,
     DetailProjectView,
+    ProjectExportView,
+    ProjectSearchView,
+    ProjectChangesView,
+    ProjectJobsView,
+    JobView,
+    JobFileView,
     ContributorsView,
+    ContributorsBatchView,
     UserContributorsView,
     ProjectIssueView,
     IssueView,
     IssueCommentView,
     CommentView,
+    BatchView,
+)
+from myapp.async_views import (
+    AsyncProjectView,
+    AsyncDetailProjectView,
+    AsyncContributorsView,
+    AsyncProjectIssueView,
+    AsyncIssueCommentView,
+    AsyncCommentView,
 )
 
 router = routers.SimpleRouter()
@@ -37,36 +54,104 @@ urlpatterns = [
     path("api/signup/", SignUpView.as_view(), name="signup"),
     path("api/login/", LoginView.as_view(), name="login"),
     path("api/projects/", ProjectView.as_view(), name="projects"),
-    path("api/projects/<int:project_id>", DetailProjectView.as_view(), name="projects"),
+    path(
+        "api/projects/<int:project_id>",
+        DetailProjectView.as_view(),
+        name="project-detail",
+    ),
+    path(
+        "api/projects/<int:project_id>/export/",
+        ProjectExportView.as_view(),
+        name="project-export",
+    ),
+    path(
+        "api/projects/<int:project_id>/search/",
+        ProjectSearchView.as_view(),
+        name="project-search",
+    ),
+    path(
+        "api/projects/<int:project_id>/changes/",
+        ProjectChangesView.as_view(),
+        name="project-changes",
+    ),
+    path(
+        "api/projects/<int:project_id>/jobs/",
+        ProjectJobsView.as_view(),
+        name="project-jobs",
+    ),
+    path(
+        "api/projects/<int:project_id>/jobs/<int:job_id>",
+        JobView.as_view(),
+        name="project-job",
+    ),
+    path(
+        "api/projects/<int:project_id>/jobs/<int:job_id>/file",
+        JobFileView.as_view(),
+        name="project-job-file",
+    ),
     path(
         "api/projects/<int:project_id>/users/",
         ContributorsView.as_view(),
-        name="projects",
+        name="project-users",
+    ),
+    path(
+        "api/projects/<int:project_id>/users/batch/",
+        ContributorsBatchView.as_view(),
+        name="project-users-batch",
     ),
     path(
         "api/projects/<int:project_id>/users/<int:user_id>",
         UserContributorsView.as_view(),
-        name="projects",
+        name="project-user",
     ),
     path(
         "api/projects/<int:project_id>/issues/",
         ProjectIssueView.as_view(),
-        name="projects",
+        name="project-issues",
     ),
     path(
         "api/projects/<int:project_id>/issues/<int:issue_id>",
         IssueView.as_view(),
-        name="projects",
+        name="project-issue",
     ),
     path(
         "api/projects/<int:project_id>/issues/<int:issue_id>/comments/",
         IssueCommentView.as_view(),
-        name="projects",
+        name="issue-comments",
     ),
     path(
         "api/projects/<int:project_id>/issues/<int:issue_id>/comments/<int:comment_id>",
         CommentView.as_view(),
-        name="projects",
+        name="issue-comment",
+    ),
+    path("api/batch/", BatchView.as_view(), name="batch"),
+    # Async stack, for ASGI deployments (softdesk.asgi)
+    path("api/async/login/", AsyncLoginView.as_view(), name="async-login"),
+    path("api/async/projects/", AsyncProjectView.as_view(), name="async-projects"),
+    path(
+        "api/async/projects/<int:project_id>",
+        AsyncDetailProjectView.as_view(),
+        name="async-project-detail",
+    ),
+    path(
+        "api/async/projects/<int:project_id>/users/",
+        AsyncContributorsView.as_view(),
+        name="async-project-users",
+    ),
+    path(
+        "api/async/projects/<int:project_id>/issues/",
+        AsyncProjectIssueView.as_view(),
+        name="async-project-issues",
+    ),
+    path(
+        "api/async/projects/<int:project_id>/issues/<int:issue_id>/comments/",
+        AsyncIssueCommentView.as_view(),
+        name="async-issue-comments",
+    ),
+    path(
+        "api/async/projects/<int:project_id>/issues/<int:issue_id>/comments/<int:comment_id>",
+        AsyncCommentView.as_view(),
+        name="async-issue-comment",
     ),
     path("api/", include(router.urls)),
 ]